@@ -2,6 +2,19 @@ import argparse
 import sys
 import subprocess
 import os
+import threading
+import time
+import selectors
+import tempfile
+import json
+import glob
+import hashlib
+import signal
+import resource
+import shutil
+import errno
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Try to import yaml
 try:
@@ -24,52 +37,700 @@ def is_safe(command_parts):
     
     return binary_name in ALLOWED_COMMANDS
 
-def run_step(step, dry_run=False, force=False):
-    """Run a single step"""
+# Output shown (or buffered) per step before the rest spills to a file
+DEFAULT_OUTPUT_LIMIT = 1024 * 1024
+
+# stderr kept for the failure report
+STDERR_TAIL_LINES = 20
+# Longest stderr line kept (the end of longer lines is kept)
+STDERR_LINE_MAX = 4096
+
+# Seconds between SIGTERM and SIGKILL when a step times out
+KILL_GRACE = 2.0
+
+# rlimit keys accepted in a step's `rlimit` mapping
+RLIMITS = {
+    "cpu": resource.RLIMIT_CPU,        # seconds of CPU time
+    "as": resource.RLIMIT_AS,          # address space (bytes, K/M/G suffix allowed)
+    "nofile": resource.RLIMIT_NOFILE,  # open file descriptors
+    "fsize": resource.RLIMIT_FSIZE,    # largest file the step may write
+}
+
+SIZE_SUFFIXES = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# Applies rlimits in a fresh interpreter, then execs the step. Doing this in
+# preexec_fn is not safe while other steps run in threads.
+# argv: <json [[resource, limit], ...]> <program path> <args...>
+RLIMIT_SHIM = (
+    "import json, os, resource, sys\n"
+    "for res, value in json.loads(sys.argv[1]):\n"
+    "    resource.setrlimit(res, (value, value))\n"
+    "os.execv(sys.argv[2], sys.argv[3:])\n"
+)
+
+def parse_rlimits(spec):
+    """
+    Turn a step's `rlimit` mapping into [(resource, limit)], capped at the
+    current hard limit so an unprivileged run never fails in the child.
+    Raises ValueError for unknown keys or bad values.
+    """
+    if spec is None:
+        return []
+    if not isinstance(spec, dict):
+        raise ValueError(f"rlimit must be a mapping like {{cpu: 10, as: 512M}}, got {type(spec).__name__}")
+    limits = []
+    for name, value in spec.items():
+        if name not in RLIMITS:
+            raise ValueError(f"Unknown rlimit '{name}' (allowed: {', '.join(RLIMITS)})")
+        text = str(value).strip().lower()
+        factor = SIZE_SUFFIXES.get(text[-1:], 1)
+        digits = text[:-1] if factor > 1 else text
+        if not digits.isdigit():
+            raise ValueError(f"rlimit '{name}' must be a whole number, optionally with a K/M/G suffix (got '{value}')")
+        number = int(digits) * factor
+        _, hard = resource.getrlimit(RLIMITS[name])
+        if hard != resource.RLIM_INFINITY:
+            number = min(number, hard)
+        limits.append((RLIMITS[name], number))
+    return limits
+
+def execute_command(cmd_parts, out=print, output_limit=DEFAULT_OUTPUT_LIMIT, spill_dir=None, timeout=None, rlimits=None):
+    """
+    Run cmd_parts, streaming stdout line by line to `out`.
+    After output_limit bytes the remaining stdout goes to a spill file instead
+    of memory/terminal. With a timeout the command runs in its own process
+    group, which gets SIGTERM (then SIGKILL) when time runs out. rlimits are
+    applied by RLIMIT_SHIM right before it execs the command. Resource usage
+    is collected with os.wait4.
+    Returns dict: returncode, timed_out, wall, cpu, max_rss_kb, output_bytes, spill_path, stderr.
+    """
+    argv = cmd_parts
+    if rlimits:
+        program = shutil.which(cmd_parts[0])
+        if program is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cmd_parts[0])
+        argv = [sys.executable, "-c", RLIMIT_SHIM, json.dumps(rlimits), program, *cmd_parts]
+
+    start = time.monotonic()
+    # Run command SAFELY without shell=True
+    # This prevents shell injection (e.g. "echo hi; rm -rf /")
+    proc = subprocess.Popen(argv, shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=timeout is not None)
+
+    def signal_step(sig):
+        try:
+            if timeout is not None:
+                os.killpg(proc.pid, sig)
+            else:
+                os.kill(proc.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    shown = 0
+    total = 0
+    spill = None
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    partial = {proc.stdout: bytearray(), proc.stderr: bytearray()}
+    deadline = start + timeout if timeout is not None else None
+    # 0 = running, 1 = SIGTERM sent, 2 = SIGKILL sent
+    kill_phase = 0
+
+    def emit(line):
+        nonlocal shown, total, spill
+        total += len(line)
+        if spill is None and shown + len(line) <= output_limit:
+            shown += len(line)
+            out(f"      {line.decode(errors='replace').rstrip()}")
+            return
+        if spill is None:
+            spill = tempfile.NamedTemporaryFile(prefix="autoflow-", suffix=".log", dir=spill_dir, delete=False)
+            out(f"    [OUTPUT LIMIT]: {output_limit} bytes shown, rest written to {spill.name}")
+        spill.write(line)
+
+    def feed_stdout(chunk):
+        buf = partial[proc.stdout]
+        if spill is not None:
+            # Past the limit: no need to split lines any more
+            emit(chunk)
+            return
+        pos = 0
+        search = len(buf)
+        buf += chunk
+        while True:
+            nl = buf.find(b"\n", search)
+            if nl < 0:
+                break
+            emit(bytes(buf[pos:nl + 1]))
+            pos = search = nl + 1
+            if spill is not None:
+                emit(bytes(buf[pos:]))
+                buf.clear()
+                return
+        del buf[:pos]
+        if len(buf) > output_limit - shown:
+            # This line can never be shown; stream it to the spill file
+            # instead of holding it in memory until its newline arrives
+            emit(bytes(buf))
+            buf.clear()
+
+    def feed_stderr(chunk):
+        buf = partial[proc.stderr]
+        buf += chunk
+        *lines, rest = buf.split(b"\n")
+        for line in lines:
+            stderr_tail.append(line[-STDERR_LINE_MAX:].decode(errors='replace'))
+        buf[:] = rest[-STDERR_LINE_MAX:]
+
+    try:
+        with selectors.DefaultSelector() as sel:
+            sel.register(proc.stdout, selectors.EVENT_READ)
+            sel.register(proc.stderr, selectors.EVENT_READ)
+            while sel.get_map():
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        if kill_phase == 2:
+                            # Something outside the group still holds the pipes
+                            break
+                        kill_phase += 1
+                        signal_step(signal.SIGTERM if kill_phase == 1 else signal.SIGKILL)
+                        deadline = time.monotonic() + KILL_GRACE
+                        continue
+                for key, _ in sel.select(wait):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        sel.unregister(key.fileobj)
+                        if not partial[key.fileobj]:
+                            continue
+                        # Flush an unterminated last line
+                        chunk = b"\n"
+                    if key.fileobj is proc.stdout:
+                        feed_stdout(chunk)
+                    else:
+                        feed_stderr(chunk)
+    except BaseException:
+        # e.g. Ctrl+C: don't leave the step running behind us
+        signal_step(signal.SIGKILL)
+        raise
+    finally:
+        if kill_phase:
+            signal_step(signal.SIGKILL)
+            kill_phase = 2
+        # The step may have closed its pipes and kept running: keep
+        # enforcing the deadline while waiting for it to exit
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG if kill_phase < 2 and deadline is not None else 0)
+            if pid:
+                break
+            if time.monotonic() >= deadline:
+                kill_phase += 1
+                signal_step(signal.SIGTERM if kill_phase == 1 else signal.SIGKILL)
+                deadline = time.monotonic() + KILL_GRACE
+            time.sleep(0.05)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.stdout.close()
+        proc.stderr.close()
+        if spill:
+            spill.close()
+
+    return {
+        "returncode": proc.returncode,
+        "timed_out": kill_phase > 0,
+        "wall": time.monotonic() - start,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "output_bytes": total,
+        "spill_path": spill.name if spill else None,
+        "stderr": "\n".join(stderr_tail),
+    }
+
+DEFAULT_CACHE_DIR = ".autoflow_cache"
+DEFAULT_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+class StepCache:
+    """
+    Content-addressed store of step results. The key hashes the command,
+    declared input files and selected env vars; file contents are only
+    re-hashed when their mtime/size changed since the last run. Entries are
+    evicted least-recently-used once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.index_path = os.path.join(directory, "stat-index.json")
+        try:
+            with open(self.index_path, "r") as f:
+                self.stat_index = json.load(f)
+        except (OSError, ValueError):
+            self.stat_index = {}
+
+    def file_digest(self, path):
+        st = os.stat(path)
+        real = os.path.realpath(path)
+        with self.lock:
+            known = self.stat_index.get(real)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self.lock:
+            self.stat_index[real] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def key(self, step, cmd_str):
+        """Cache key for a step, or None if a declared input is missing"""
+        spec = step.get('cache')
+        spec = spec if isinstance(spec, dict) else {}
+        h = hashlib.sha256()
+        h.update(cmd_str.encode())
+        for pattern in spec.get('inputs') or []:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+            for path in matches:
+                try:
+                    digest = self.file_digest(path)
+                except OSError:
+                    return None
+                h.update(f"\0file:{path}:{digest}".encode())
+        for name in spec.get('env') or []:
+            h.update(f"\0env:{name}={os.environ.get(name)}".encode())
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, entry):
+        """Store an entry. Returns None, or the error if it could not be stored."""
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self.entry_path(key))
+        except OSError as e:
+            if tmp:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return e.strerror or str(e)
+        self.evict()
+        return None
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        with self.lock:
+            entries = []
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                if name.endswith(".json") and name != "stat-index.json":
+                    try:
+                        st = os.stat(os.path.join(self.directory, name))
+                    except OSError:
+                        # Removed by a concurrent run
+                        continue
+                    entries.append((st.st_mtime, st.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    pass
+
+    def save(self):
+        """Persist the mtime/size -> digest index"""
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.index_path + ".tmp", "w") as f:
+                    json.dump(self.stat_index, f)
+                os.replace(self.index_path + ".tmp", self.index_path)
+            except OSError:
+                pass
+
+def step_limits(step):
+    """
+    (timeout, retries, backoff, rlimits) from a step's keys.
+    Raises ValueError for malformed values.
+    """
+    try:
+        timeout = float(step['timeout']) if step.get('timeout') is not None else None
+        retries = max(0, int(step.get('retries', 0)))
+        backoff = float(step.get('backoff', 1.0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid timeout/retries/backoff: {e}")
+    return timeout, retries, backoff, parse_rlimits(step.get('rlimit'))
+
+def run_attempts(cmd_parts, limits, out=print, output_limit=DEFAULT_OUTPUT_LIMIT, spill_dir=None, headers=True):
+    """
+    Run cmd_parts up to 1 + retries times with exponential backoff.
+    Returns the final execute_command result extended with "ok" and "output"
+    (lines of the last attempt), or None if the binary does not exist.
+    headers=False drops the per-attempt [OUTPUT]/[STATS] lines.
+    """
+    timeout, retries, backoff, rlimits = limits
+    captured = []
+
+    def record(line):
+        captured.append(line)
+        out(line)
+
+    for attempt in range(retries + 1):
+        if attempt:
+            # Exponential backoff: backoff, 2*backoff, 4*backoff, ...
+            delay = backoff * 2 ** (attempt - 1)
+            out(f"    [RETRY]: attempt {attempt + 1}/{retries + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            captured.clear()
+
+        if headers:
+            out("    [OUTPUT]:")
+        try:
+            result = execute_command(cmd_parts, out=record, output_limit=output_limit,
+                                     spill_dir=spill_dir, timeout=timeout, rlimits=rlimits)
+        except FileNotFoundError:
+            out(f"    [ERROR]: Command not found: {cmd_parts[0]}")
+            return None
+        result["output"] = captured
+        result["ok"] = False
+
+        if headers:
+            out(f"    [STATS]: wall {result['wall']:.2f}s, cpu {result['cpu']:.2f}s, peak RSS {result['max_rss_kb'] / 1024:.1f} MB")
+        if result["timed_out"]:
+            out(f"    [TIMEOUT]: Command exceeded {timeout}s and was killed")
+        elif result["returncode"] != 0:
+            out(f"    [ERROR]: Command failed with exit code {result['returncode']}")
+            out(f"    [STDERR]: {result['stderr'].strip()}")
+        else:
+            result["ok"] = True
+            return result
+
+    return result
+
+# Parallel invocations per for_each step unless it sets `concurrency`
+DEFAULT_FOR_EACH_CONCURRENCY = 4
+
+# Smallest per-item output budget when a for_each step splits output_limit
+MIN_ITEM_OUTPUT = 4096
+
+def expand_items(spec):
+    """
+    Items and concurrency from a for_each spec, which is either a list of
+    items, a glob string, or a mapping with `items` or `glob` and optional
+    `concurrency`. Raises ValueError for anything else.
+    """
+    if isinstance(spec, str):
+        spec = {"glob": spec}
+    elif isinstance(spec, list):
+        spec = {"items": spec}
+    if not isinstance(spec, dict) or ("glob" in spec) == ("items" in spec):
+        raise ValueError("for_each needs a list, a glob, or a mapping with exactly one of 'items'/'glob'")
+
+    if "glob" in spec:
+        items = sorted(glob.glob(str(spec["glob"]), recursive=True))
+    else:
+        items = [str(item) for item in spec["items"] or []]
+
+    try:
+        concurrency = int(spec.get("concurrency", DEFAULT_FOR_EACH_CONCURRENCY))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid for_each concurrency: {spec.get('concurrency')!r}")
+    return items, max(1, concurrency)
+
+def expand_command(cmd_parts, item):
+    """
+    Substitute {item} inside the already-split command, so an item with
+    spaces or shell characters stays a single argument. Without a
+    placeholder the item is appended as the last argument.
+    """
+    if not any("{item}" in part for part in cmd_parts):
+        return cmd_parts + [item]
+    return [part.replace("{item}", item) for part in cmd_parts]
+
+def run_for_each(step, cmd_parts, dry_run=False, force=False, out=print, output_limit=DEFAULT_OUTPUT_LIMIT, spill_dir=None, cache=None):
+    """
+    Fan a step out over its for_each items on a bounded thread pool.
+    Every expanded command must pass is_safe before any of them runs.
+    Item output is printed in item order with one aggregated [STATS] line.
+    With `cache`, the key also covers the expanded item list.
+    """
+    import shlex
+
+    try:
+        items, concurrency = expand_items(step['for_each'])
+        limits = step_limits(step)
+    except ValueError as e:
+        out(f"    [ERROR]: {e}")
+        return False
+
+    if not items:
+        out("    [FOR_EACH]: No items matched. Nothing to do.")
+        return True
+
+    commands = [(item, expand_command(cmd_parts, item)) for item in items]
+
+    # Security Check (every expanded command, before anything runs)
+    if not force:
+        for item, parts in commands:
+            if not is_safe(parts):
+                out(f"    [BLOCKED] Binary '{parts[0]}' (item '{item}') is not in whitelist.")
+                out(f"    Use --force to override. Allowed: {ALLOWED_COMMANDS}")
+                return False
+
+    out(f"    [FOR_EACH]: {len(items)} items, concurrency {concurrency}")
+    if dry_run:
+        for _, parts in commands:
+            out(f"    [DRY-RUN] Would execute: {shlex.join(parts)}")
+        return True
+
+    cmd_str = shlex.join(cmd_parts)
+    key = None
+    if cache and step.get('cache'):
+        key = cache.key(step, cmd_str + "\0items:" + "\0".join(items))
+    if key:
+        entry = cache.get(key)
+        if entry:
+            out("    [CACHED]: Inputs unchanged, replaying stored result.")
+            for line in entry["output"]:
+                out(line)
+            return entry["returncode"] == 0
+
+    # The step's output budget is shared between its items
+    item_limit = max(MIN_ITEM_OUTPUT, output_limit // len(items))
+
+    def run_item(parts):
+        lines = []
+        result = run_attempts(parts, limits, out=lines.append, output_limit=item_limit,
+                              spill_dir=spill_dir, headers=False)
+        return result, lines
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(run_item, [parts for _, parts in commands]))
+    wall = time.monotonic() - start
+
+    captured = []
+
+    def record(line):
+        captured.append(line)
+        out(line)
+
+    succeeded = 0
+    cpu = 0.0
+    peak_rss_kb = 0
+    spilled = False
+    for (item, _), (result, lines) in zip(commands, outcomes):
+        if result:
+            cpu += result["cpu"]
+            peak_rss_kb = max(peak_rss_kb, result["max_rss_kb"])
+            spilled = spilled or bool(result["spill_path"])
+        ok = bool(result and result["ok"])
+        succeeded += ok
+        timing = f" ({result['wall']:.2f}s)" if result else ""
+        record(f"    [ITEM] {item}: {'ok' if ok else 'FAILED'}{timing}")
+        for line in lines:
+            record(line)
+
+    failed = len(items) - succeeded
+    out(f"    [STATS]: {len(items)} items, {succeeded} ok, {failed} failed, "
+        f"wall {wall:.2f}s, cpu {cpu:.2f}s, peak RSS {peak_rss_kb / 1024:.1f} MB")
+
+    # Only complete, successful results are worth replaying
+    if key and not failed and not spilled:
+        error = cache.put(key, {"command": cmd_str, "items": items, "returncode": 0,
+                                "output": captured, "created": time.time()})
+        if error:
+            out(f"    [CACHE]: Result not stored ({error}).")
+    return failed == 0
+
+def run_step(step, dry_run=False, force=False, out=print, output_limit=DEFAULT_OUTPUT_LIMIT, spill_dir=None, cache=None):
+    """Run a single step. All output goes through `out` (print by default)."""
     import shlex
     
     name = step.get('name', 'Unnamed Step')
     cmd_str = step.get('run', '')
     
-    print(f"[*] Step: {name}")
-    print(f"    Command: {cmd_str}")
+    out(f"[*] Step: {name}")
+    out(f"    Command: {cmd_str}")
     
     if not cmd_str:
-        print("    [!] Empty command. Skipping.")
+        out("    [!] Empty command. Skipping.")
         return False
 
     try:
         # Split command for shell=False execution
         cmd_parts = shlex.split(cmd_str)
     except ValueError:
-        print(f"    [ERROR] Could not parse command string: {cmd_str}")
+        out(f"    [ERROR] Could not parse command string: {cmd_str}")
         return False
 
+    if step.get('for_each') is not None:
+        return run_for_each(step, cmd_parts, dry_run=dry_run, force=force, out=out,
+                            output_limit=output_limit, spill_dir=spill_dir, cache=cache)
+
     # Security Check
     if not force:
         if not is_safe(cmd_parts):
-            print(f"    [BLOCKED] Binary '{cmd_parts[0]}' is not in whitelist.")
-            print(f"    Use --force to override. Allowed: {ALLOWED_COMMANDS}")
+            out(f"    [BLOCKED] Binary '{cmd_parts[0]}' is not in whitelist.")
+            out(f"    Use --force to override. Allowed: {ALLOWED_COMMANDS}")
             return False
 
     if dry_run:
-        print("    [DRY-RUN] Would execute now.")
+        out("    [DRY-RUN] Would execute now.")
         return True
 
+    key = cache.key(step, cmd_str) if cache and step.get('cache') else None
+    if key:
+        entry = cache.get(key)
+        if entry:
+            out("    [CACHED]: Inputs unchanged, replaying stored result.")
+            out("    [OUTPUT]:")
+            for line in entry["output"]:
+                out(line)
+            return entry["returncode"] == 0
+
     try:
-        # Run command SAFELY without shell=True
-        # This prevents shell injection (e.g. "echo hi; rm -rf /")
-        result = subprocess.run(cmd_parts, shell=False, check=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print(f"    [OUTPUT]: {result.stdout.strip()}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"    [ERROR]: Command failed with exit code {e.returncode}")
-        print(f"    [STDERR]: {e.stderr.strip()}")
+        limits = step_limits(step)
+    except ValueError as e:
+        out(f"    [ERROR]: {e}")
         return False
-    except FileNotFoundError:
-        print(f"    [ERROR]: Command not found: {cmd_parts[0]}")
+
+    result = run_attempts(cmd_parts, limits, out=out, output_limit=output_limit, spill_dir=spill_dir)
+    if not result or not result["ok"]:
         return False
 
+    # Only complete, successful results are worth replaying
+    if key and not result["spill_path"]:
+        error = cache.put(key, {"command": cmd_str, "returncode": 0, "output": result["output"], "created": time.time()})
+        if error:
+            out(f"    [CACHE]: Result not stored ({error}).")
+    return True
+
+
+def step_id(step, index):
+    """Explicit `id`, or step<N> (1-based position)"""
+    return str(step.get('id') or f"step{index}")
+
+def build_graph(steps):
+    """
+    Map step id -> set of dependency ids.
+    Workflows without any `depends_on` keep the classic sequential order:
+    each step implicitly depends on the one before it.
+    Raises ValueError for duplicate ids, unknown dependencies or cycles.
+    """
+    ids = [step_id(step, i) for i, step in enumerate(steps, 1)]
+    if len(set(ids)) != len(ids):
+        dupes = sorted({x for x in ids if ids.count(x) > 1})
+        raise ValueError(f"Duplicate step id(s): {', '.join(dupes)}")
+
+    uses_dag = any('depends_on' in step for step in steps)
+    deps = {}
+    for i, (sid, step) in enumerate(zip(ids, steps)):
+        if uses_dag:
+            raw = step.get('depends_on') or []
+            deps[sid] = {str(d) for d in ([raw] if isinstance(raw, (str, int)) else raw)}
+        else:
+            deps[sid] = {ids[i - 1]} if i else set()
+        unknown = deps[sid] - set(ids)
+        if unknown:
+            raise ValueError(f"Step '{sid}' depends on unknown step(s): {', '.join(sorted(unknown))}")
+
+    topo_order(ids, deps)
+    return ids, deps
+
+def topo_order(ids, deps):
+    """Kahn's algorithm; raises ValueError naming the steps involved in a cycle"""
+    remaining = {sid: set(d) for sid, d in deps.items()}
+    order = []
+    ready = [sid for sid in ids if not remaining[sid]]
+    while ready:
+        sid = ready.pop(0)
+        order.append(sid)
+        for other in ids:
+            if sid in remaining[other]:
+                remaining[other].discard(sid)
+                if not remaining[other]:
+                    ready.append(other)
+    if len(order) != len(ids):
+        cyclic = [sid for sid in ids if sid not in order]
+        raise ValueError(f"Dependency cycle between steps: {', '.join(cyclic)}")
+    return order
+
+def run_workflow(steps, dry_run=False, force=False, max_parallel=1, output_limit=DEFAULT_OUTPUT_LIMIT, spill_dir=None, cache=None):
+    """
+    Run steps as a DAG on up to `max_parallel` workers.
+    When steps can overlap, each step's output is buffered (bounded by
+    output_limit) and printed as one block when it finishes, so parallel steps
+    never interleave; otherwise output streams live. After the first failure
+    no new steps start; running ones are allowed to finish. Returns True on success.
+    """
+    ids, deps = build_graph(steps)
+    by_id = dict(zip(ids, steps))
+    position = {sid: i for i, sid in enumerate(ids, 1)}
+    print_lock = threading.Lock()
+    live = max_parallel <= 1 or not any('depends_on' in step for step in steps)
+
+    def live_print(line):
+        print(line, flush=True)
+
+    def execute(sid):
+        header = f"\n--- Step {position[sid]}/{len(steps)} ({sid}) ---"
+        if live:
+            print(header, flush=True)
+            return run_step(by_id[sid], dry_run=dry_run, force=force, out=live_print,
+                            output_limit=output_limit, spill_dir=spill_dir, cache=cache)
+        lines = [header]
+        ok = run_step(by_id[sid], dry_run=dry_run, force=force, out=lines.append,
+                      output_limit=output_limit, spill_dir=spill_dir, cache=cache)
+        with print_lock:
+            print("\n".join(lines), flush=True)
+        return ok
+
+    done = set()
+    pending = {}
+    failed = False
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        while True:
+            if not failed:
+                for sid in ids:
+                    if sid not in done and sid not in pending.values() and deps[sid] <= done:
+                        pending[pool.submit(execute, sid)] = sid
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                sid = pending.pop(future)
+                if future.result() or dry_run:
+                    done.add(sid)
+                else:
+                    failed = True
+
+    if cache:
+        cache.save()
+    return not failed
 
 def main():
     parser = argparse.ArgumentParser(description="AutoFlow: Safe Workflow Automator")
@@ -77,6 +738,12 @@ def main():
     parser.add_argument("workflow", help="Path to YAML workflow file")
     parser.add_argument("--dry-run", action="store_true", help="Simulate execution")
     parser.add_argument("--force", action="store_true", help="Allow unsafe commands (DANGEROUS)")
+    parser.add_argument("--output-limit", type=int, default=DEFAULT_OUTPUT_LIMIT, help="Bytes of output shown per step before spilling to a file (default: 1 MiB)")
+    parser.add_argument("--spill-dir", help="Directory for spilled step output (default: system temp dir)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore step caches and always execute")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Step cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=int, default=100, help="Evict least recently used cache entries above this size (default: 100)")
+    parser.add_argument("--max-parallel", type=int, default=4, help="Max steps running at once for depends_on workflows (default: 4)")
     
     args = parser.parse_args()
     
@@ -84,6 +751,10 @@ def main():
         print(f"Error: Workflow file {args.workflow} not found.")
         sys.exit(1)
 
+    if args.spill_dir and not os.path.isdir(args.spill_dir):
+        print(f"Error: Spill directory {args.spill_dir} does not exist.")
+        sys.exit(1)
+
     try:
         with open(args.workflow, 'r') as f:
             data = yaml.safe_load(f)
@@ -101,12 +772,18 @@ def main():
     if args.force:
         print("[!!!] FORCE MODE ENABLED - SECURITY CHECKS DISABLED [!!!]")
 
-    for i, step in enumerate(steps, 1):
-        print(f"\n--- Step {i}/{len(steps)} ---")
-        success = run_step(step, dry_run=args.dry_run, force=args.force)
-        if not success and not args.dry_run:
-            print("\n[!] Workflow stopped due to error.")
-            sys.exit(1)
+    cache = None if args.no_cache else StepCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+    try:
+        success = run_workflow(steps, dry_run=args.dry_run, force=args.force, max_parallel=args.max_parallel,
+                               output_limit=args.output_limit, spill_dir=args.spill_dir, cache=cache)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not success:
+        print("\n[!] Workflow stopped due to error.")
+        sys.exit(1)
 
     print("\n[+] Workflow Completed Successfully.")
 
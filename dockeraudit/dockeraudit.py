@@ -2,6 +2,106 @@ import argparse
 import subprocess
 import json
 import sys
+import os
+import socket
+import threading
+import time
+import glob
+import http.client
+import urllib.parse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+
+class DockerAPIError(Exception):
+    pass
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a unix domain socket"""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class DockerAPIClient:
+    """
+    Minimal Docker Engine API client over the unix socket (stdlib only).
+    Each thread keeps one keep-alive connection that is reused across requests.
+    """
+
+    def __init__(self, socket_path=DEFAULT_DOCKER_SOCKET, timeout=10, workers=8):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.workers = workers
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def get(self, path, params=None):
+        """GET path and return decoded JSON; retries once if the daemon closed an idle connection"""
+        if params:
+            path = f"{path}?{urllib.parse.urlencode(params)}"
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if attempt:
+                    raise
+        if resp.status >= 400:
+            raise DockerAPIError(f"{path}: HTTP {resp.status} {body.decode(errors='replace').strip()}")
+        return json.loads(body) if body else None
+
+    def ping(self):
+        conn = self._connection()
+        try:
+            conn.request("GET", "/_ping")
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            return False
+
+    def containers(self, all=False):
+        return self.get("/containers/json", {"all": "1"} if all else None)
+
+    def inspect(self, object_id, kind="containers"):
+        return self.get(f"/{kind}/{urllib.parse.quote(object_id)}/json")
+
+    def inspect_many(self, object_ids, kind="containers"):
+        """Inspect containers (or images) concurrently; returns dict id -> raw inspect data (missing ids omitted)"""
+        def fetch(oid):
+            try:
+                return oid, self.inspect(oid, kind)
+            except (DockerAPIError, OSError, ValueError):
+                return oid, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return {oid: data for oid, data in pool.map(fetch, object_ids) if data}
+
+def default_socket_path():
+    """Docker socket from DOCKER_HOST (unix:// only) or the default path"""
+    host = os.environ.get("DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return DEFAULT_DOCKER_SOCKET
 
 def check_docker_installed():
     """Check if docker is installed and accessible"""
@@ -11,8 +111,20 @@ def check_docker_installed():
     except (subprocess.CalledProcessError, FileNotFoundError):
         return False
 
-def get_containers(all=False):
+def get_containers(all=False, client=None):
     """Get list of containers"""
+    if client:
+        try:
+            return [{
+                "id": c["Id"][:12],
+                "image": c.get("Image", ""),
+                "status": c.get("Status", ""),
+                "name": ",".join(n.lstrip("/") for n in c.get("Names") or [])
+            } for c in client.containers(all=all)]
+        except (DockerAPIError, OSError) as e:
+            print(f"Error listing containers: {e}")
+            return []
+
     cmd = ["docker", "ps", "--format", "{{.ID}}|{{.Image}}|{{.Status}}|{{.Names}}"]
     if all:
         cmd.append("-a")
@@ -35,26 +147,300 @@ def get_containers(all=False):
         print(f"Error listing containers: {e.stderr}")
         return []
 
+# Keep each `docker inspect` argv well below ARG_MAX
+INSPECT_BATCH_SIZE = 200
+
+def parse_inspect(data):
+    """Extract the security-relevant fields from one `docker inspect` object"""
+    config = data.get("Config") or {}
+    host_config = data.get("HostConfig") or {}
+    
+    return {
+        "user": config.get("User", ""),
+        "privileged": host_config.get("Privileged", False),
+        "pid_mode": host_config.get("PidMode", ""),
+        "network_mode": host_config.get("NetworkMode", ""),
+        "cap_add": host_config.get("CapAdd") or [],
+        "security_opt": host_config.get("SecurityOpt") or [],
+        "apparmor_profile": data.get("AppArmorProfile", ""),
+        "mounts": [
+            {"type": m.get("Type", ""), "source": m.get("Source", ""), "rw": m.get("RW", True)}
+            for m in data.get("Mounts") or []
+        ],
+        "memory": host_config.get("Memory", 0) or 0,
+        "nano_cpus": host_config.get("NanoCpus", 0) or 0,
+        "cpu_quota": host_config.get("CpuQuota", 0) or 0,
+        "readonly_rootfs": host_config.get("ReadonlyRootfs", False),
+        "image_id": data.get("Image", ""),
+    }
+
+def parse_image_inspect(data):
+    """Extract the fields rules use from one `docker image inspect` object"""
+    config = data.get("Config") or {}
+    return {
+        "id": data.get("Id", ""),
+        "tags": data.get("RepoTags") or [],
+        "created": data.get("Created", ""),
+        "user": config.get("User", ""),
+    }
+
+def cli_inspect(cmd, ids, batch_size=INSPECT_BATCH_SIZE):
+    """
+    Run `<cmd> id1 id2 ...` per batch and parse each JSON array once.
+    Returns dict: requested id -> raw inspect object (missing ids are omitted).
+    """
+    found = {}
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        # No check=True: if an object vanished docker exits 1 but still prints the rest
+        result = subprocess.run(cmd + batch, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            data = json.loads(result.stdout or "[]")
+        except json.JSONDecodeError:
+            continue
+
+        # `docker ps` gives short IDs; match them as prefixes of the full Id
+        wanted = set(batch)
+        prefix_lengths = {len(oid) for oid in batch}
+        for item in data:
+            full_id = item.get("Id", "")
+            for length in prefix_lengths:
+                if full_id[:length] in wanted:
+                    found[full_id[:length]] = item
+                    break
+    return found
+
 def inspect_container(container_id):
     """Inspect a container for security issues (privileged, root user)"""
+    return inspect_containers([container_id]).get(container_id)
+
+def inspect_containers(container_ids, batch_size=INSPECT_BATCH_SIZE, client=None):
+    """
+    Inspect many containers with one `docker inspect id1 id2 ...` per batch,
+    or concurrently over the Engine API when a client is given.
+    Returns dict: requested id -> parsed details (missing ids are omitted).
+    """
+    if client:
+        raw = client.inspect_many(container_ids)
+    else:
+        raw = cli_inspect(["docker", "inspect"], container_ids, batch_size)
+    return {cid: parse_inspect(data) for cid, data in raw.items()}
+
+# image id -> parsed image metadata, shared by every container on that image
+_image_cache = {}
+
+def inspect_images(image_ids, client=None):
+    """Inspect each distinct image once; results are cached by image ID"""
+    missing = sorted({i for i in image_ids if i and i not in _image_cache})
+    if missing:
+        if client:
+            raw = client.inspect_many(missing, kind="images")
+        else:
+            raw = cli_inspect(["docker", "image", "inspect"], missing)
+        for image_id, data in raw.items():
+            _image_cache[image_id] = parse_image_inspect(data)
+    return {i: _image_cache.get(i) for i in image_ids if i}
+
+# Capabilities that effectively grant host-level control
+DANGEROUS_CAPS = {"ALL", "SYS_ADMIN", "SYS_MODULE", "SYS_PTRACE", "SYS_RAWIO", "NET_ADMIN", "DAC_READ_SEARCH", "SYS_TIME"}
+
+# Host paths that should never be bind-mounted into a container
+SENSITIVE_MOUNTS = ["/", "/etc", "/root", "/boot", "/proc", "/sys", "/dev", "/var/run/docker.sock", "/run/docker.sock", "/var/lib/docker"]
+
+IMAGE_MAX_AGE_DAYS = 365
+
+def _image_age_days(image):
+    created = (image or {}).get("created", "")
     try:
-        cmd = ["docker", "inspect", container_id]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        data = json.loads(result.stdout)
-        if not data:
-            return None
-        
-        config = data[0].get("Config", {})
-        host_config = data[0].get("HostConfig", {})
-        
-        return {
-            "user": config.get("User", ""),
-            "privileged": host_config.get("Privileged", False),
-            "pid_mode": host_config.get("PidMode", ""),
-            "network_mode": host_config.get("NetworkMode", "")
-        }
-    except Exception:
+        created_at = datetime.strptime(created[:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
         return None
+    return (datetime.utcnow() - created_at).days
+
+def _dangerous_caps(d):
+    caps = {c.upper().replace("CAP_", "") for c in d["cap_add"]}
+    return sorted(caps & DANGEROUS_CAPS)
+
+def _sensitive_mounts(d):
+    return [m["source"] for m in d["mounts"] if m["type"] == "bind" and m["source"].rstrip("/") in {p.rstrip("/") for p in SENSITIVE_MOUNTS}]
+
+def _unconfined(d, kind):
+    opts = [o.replace(":", "=", 1) for o in d["security_opt"]]
+    if f"{kind}=unconfined" in opts:
+        return True
+    return kind == "apparmor" and d["apparmor_profile"] == "unconfined"
+
+# Declarative rule table: each check gets (details, image) and returns a truthy
+# value (optionally a list, appended to the message) when the rule fires
+RULES = [
+    {"id": "privileged", "severity": "high", "title": "Privileged Mode",
+     "check": lambda d, img: d["privileged"]},
+    {"id": "root-user", "severity": "medium", "title": "Running as Root",
+     "check": lambda d, img: d["user"] in ("", "0", "root") or d["user"].startswith(("0:", "root:"))},
+    {"id": "host-pid", "severity": "high", "title": "Host PID Shared",
+     "check": lambda d, img: d["pid_mode"] == "host"},
+    {"id": "host-network", "severity": "high", "title": "Host Network",
+     "check": lambda d, img: d["network_mode"] == "host"},
+    {"id": "capabilities", "severity": "high", "title": "Dangerous Capabilities",
+     "check": lambda d, img: _dangerous_caps(d)},
+    {"id": "host-mounts", "severity": "high", "title": "Sensitive Host Mount",
+     "check": lambda d, img: _sensitive_mounts(d)},
+    {"id": "seccomp", "severity": "medium", "title": "Seccomp Disabled",
+     "check": lambda d, img: _unconfined(d, "seccomp")},
+    {"id": "apparmor", "severity": "medium", "title": "AppArmor Disabled",
+     "check": lambda d, img: _unconfined(d, "apparmor")},
+    {"id": "memory-limit", "severity": "low", "title": "No Memory Limit",
+     "check": lambda d, img: not d["memory"]},
+    {"id": "cpu-limit", "severity": "low", "title": "No CPU Limit",
+     "check": lambda d, img: not d["nano_cpus"] and d["cpu_quota"] <= 0},
+    {"id": "readonly-rootfs", "severity": "low", "title": "Writable Root Filesystem",
+     "check": lambda d, img: not d["readonly_rootfs"]},
+    {"id": "stale-image", "severity": "low", "title": f"Image Older Than {IMAGE_MAX_AGE_DAYS} Days",
+     "check": lambda d, img: (_image_age_days(img) or 0) > IMAGE_MAX_AGE_DAYS},
+]
+
+def evaluate_rules(details, image=None, skip=()):
+    """Run every enabled rule; returns list of findings"""
+    findings = []
+    for rule in RULES:
+        if rule["id"] in skip:
+            continue
+        hit = rule["check"](details, image)
+        if not hit:
+            continue
+        message = rule["title"]
+        if isinstance(hit, list):
+            message += f" ({', '.join(hit)})"
+        findings.append({"rule": rule["id"], "severity": rule["severity"], "message": message})
+    return findings
+
+def find_issues(details, image=None, skip=()):
+    """Return list of security issues for parsed inspect details"""
+    return [f["message"] for f in evaluate_rules(details, image, skip)]
+
+def audit_containers(inspected, client=None, skip=(), workers=8):
+    """
+    Evaluate rules for every inspected container in a thread pool.
+    Returns dict: container id -> findings.
+    """
+    images = inspect_images([d["image_id"] for d in inspected.values()], client=client)
+
+    def evaluate(item):
+        cid, details = item
+        return cid, evaluate_rules(details, images.get(details["image_id"]), skip)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(evaluate, inspected.items()))
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# systemd cgroup driver, then cgroupfs driver
+CGROUP_PATTERNS = ["system.slice/docker-*.scope", "docker/*"]
+
+def find_container_cgroups(root=CGROUP_ROOT):
+    """Map full container id -> cgroup v2 directory with a single glob per layout"""
+    cgroups = {}
+    for pattern in CGROUP_PATTERNS:
+        for path in glob.glob(os.path.join(root, pattern)):
+            name = os.path.basename(path)
+            if name.startswith("docker-") and name.endswith(".scope"):
+                name = name[len("docker-"):-len(".scope")]
+            if len(name) == 64 and os.path.isdir(path):
+                cgroups[name] = path
+    return cgroups
+
+def read_cgroup_sample(path):
+    """Read cpu.stat, memory.current and io.stat for one cgroup; None if it vanished"""
+    sample = {"cpu_usec": 0, "memory": 0, "io_read": 0, "io_write": 0}
+    try:
+        with open(os.path.join(path, "cpu.stat")) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if key == "usage_usec":
+                    sample["cpu_usec"] = int(value)
+                    break
+        with open(os.path.join(path, "memory.current")) as f:
+            sample["memory"] = int(f.read().strip() or 0)
+        try:
+            with open(os.path.join(path, "io.stat")) as f:
+                for line in f:
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "rbytes":
+                            sample["io_read"] += int(value)
+                        elif key == "wbytes":
+                            sample["io_write"] += int(value)
+        except FileNotFoundError:
+            # io controller not enabled for this cgroup
+            pass
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return sample
+
+def collect_stats(interval=1.0, root=CGROUP_ROOT):
+    """
+    Sample every container cgroup twice, `interval` seconds apart, and compute
+    CPU %, memory and IO rates in one pass (no per-container `docker stats`).
+    """
+    cgroups = find_container_cgroups(root)
+    first = {cid: read_cgroup_sample(path) for cid, path in cgroups.items()}
+    start = time.monotonic()
+    time.sleep(interval)
+    second = {cid: read_cgroup_sample(path) for cid, path in cgroups.items()}
+    elapsed = time.monotonic() - start
+
+    stats = []
+    for cid, before in first.items():
+        after = second.get(cid)
+        if not before or not after:
+            continue
+        stats.append({
+            "id": cid[:12],
+            "cpu_percent": round((after["cpu_usec"] - before["cpu_usec"]) / (elapsed * 1e6) * 100, 2),
+            "memory_bytes": after["memory"],
+            "io_read_bps": int((after["io_read"] - before["io_read"]) / elapsed),
+            "io_write_bps": int((after["io_write"] - before["io_write"]) / elapsed),
+        })
+    return stats
+
+def format_bytes(num):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if num < 1024:
+            return f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}PB"
+
+STATS_SORT_KEYS = {
+    "cpu": lambda s: s["cpu_percent"],
+    "mem": lambda s: s["memory_bytes"],
+    "io": lambda s: s["io_read_bps"] + s["io_write_bps"],
+}
+
+def print_stats(stats):
+    print(f"{'CONTAINER':<14} {'NAME':<24} {'CPU%':>8} {'MEMORY':>10} {'READ/s':>10} {'WRITE/s':>10}")
+    print("-" * 81)
+    for st in stats:
+        print(f"{st['id']:<14} {st['name'][:24]:<24} {st['cpu_percent']:>8.2f} {format_bytes(st['memory_bytes']):>10} "
+              f"{format_bytes(st['io_read_bps']):>10} {format_bytes(st['io_write_bps']):>10}")
+
+def run_stats(args, client=None):
+    """Print the top containers by resource usage"""
+    if not os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+        print("Error: --stats requires cgroup v2 (unified hierarchy).")
+        sys.exit(1)
+
+    names = {c["id"]: c["name"] for c in get_containers(client=client)}
+    if not args.json:
+        print(f"[*] Sampling container cgroups over {args.interval}s...")
+    stats = collect_stats(args.interval)
+    for st in stats:
+        st["name"] = names.get(st["id"], "?")
+
+    top = sorted(stats, key=STATS_SORT_KEYS[args.sort], reverse=True)[:args.top]
+    if args.json:
+        print(json.dumps({"stats": top}, indent=4))
+    else:
+        print_stats(top)
 
 def main():
     parser = argparse.ArgumentParser(description="DockerAudit: Simple Container Security Auditor")
@@ -63,6 +449,14 @@ def main():
     parser.add_argument("--list", action="store_true", help="List active containers")
     parser.add_argument("--all", action="store_true", help="List all containers (including stopped)")
     parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--stats", action="store_true", help="Show live CPU/memory/IO usage from cgroup v2")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sampling interval for --stats (seconds, default: 1.0)")
+    parser.add_argument("--top", type=int, default=10, help="Number of containers shown by --stats (default: 10)")
+    parser.add_argument("--sort", choices=sorted(STATS_SORT_KEYS), default="cpu", help="Sort --stats by cpu, mem or io (default: cpu)")
+    parser.add_argument("--backend", choices=["auto", "cli", "api"], default="auto", help="Use the docker CLI or the Engine API socket (default: auto)")
+    parser.add_argument("--skip", action="append", metavar="RULE", help="Skip an audit rule by id (repeatable)")
+    parser.add_argument("--rules", action="store_true", help="List audit rules and exit")
+    parser.add_argument("--socket", default=default_socket_path(), help=f"Docker API socket (default: $DOCKER_HOST or {DEFAULT_DOCKER_SOCKET})")
     
     args = parser.parse_args()
     
@@ -70,13 +464,31 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    if not check_docker_installed():
+    if args.rules:
+        for rule in RULES:
+            print(f"{rule['id']:<16} {rule['severity']:<8} {rule['title']}")
+        sys.exit(0)
+
+    client = None
+    if args.backend != "cli":
+        api = DockerAPIClient(args.socket)
+        if api.ping():
+            client = api
+        elif args.backend == "api":
+            print(f"Error: Cannot reach Docker API at {args.socket}.")
+            sys.exit(1)
+
+    if client is None and not check_docker_installed():
         print("Error: Docker is not installed or not in PATH.")
         sys.exit(1)
 
     report = {"containers": [], "issues": []}
 
-    containers = get_containers(all=args.all)
+    if args.stats:
+        run_stats(args, client)
+        return
+
+    containers = get_containers(all=args.all, client=client)
     report["containers"] = containers
     
     if args.list or args.audit:
@@ -87,26 +499,23 @@ def main():
                     print(f"[{c['id']}] {c['name']} ({c['image']}) - {c['status']}")
 
     if args.audit:
-        print("\n[*] Auditing Containers...")
+        if not args.json:
+            print("\n[*] Auditing Containers...")
+        inspected = inspect_containers([c['id'] for c in containers], client=client)
+        findings = audit_containers(inspected, client=client, skip=set(args.skip or []))
         for c in containers:
-            details = inspect_container(c['id'])
-            if details:
-                issues = []
-                if details['privileged']:
-                    issues.append("Privileged Mode")
-                if details['user'] == "" or details['user'] == "0" or details['user'] == "root":
-                   issues.append("Running as Root")
-                if details['pid_mode'] == "host":
-                    issues.append("Host PID Shared")
-                
-                if issues:
-                    c['issues'] = issues
-                    report["issues"].append({"id": c['id'], "name": c['name'], "issues": issues})
-                    if not args.json:
-                        print(f"[WARN] {c['name']} ({c['id']}): {', '.join(issues)}")
-                else:
-                    if not args.json:
-                        print(f"[OK] {c['name']}")
+            if c['id'] not in findings:
+                continue
+            issues = [f["message"] for f in findings[c['id']]]
+            
+            if issues:
+                c['issues'] = issues
+                report["issues"].append({"id": c['id'], "name": c['name'], "issues": issues, "findings": findings[c['id']]})
+                if not args.json:
+                    print(f"[WARN] {c['name']} ({c['id']}): {', '.join(issues)}")
+            else:
+                if not args.json:
+                    print(f"[OK] {c['name']}")
 
     if args.json:
         print(json.dumps(report, indent=4))
@@ -6,10 +6,209 @@ import urllib.request
 import json
 import subprocess
 import platform
+import os
+import errno
+import asyncio
+import ipaddress
+import math
+import re
+import select
+import struct
+import itertools
+import threading
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor, Future
 
-def check_ping(host):
+Resolution = namedtuple("Resolution", ["addresses", "seconds", "cached", "error"])
+
+class Resolver:
+    """
+    Caching DNS layer in front of getaddrinfo. Lookups are timed separately
+    from connects, cached for `ttl` seconds (failures for `negative_ttl`),
+    de-duplicated while in flight, and run on a bounded thread pool.
+    getaddrinfo does not expose record TTLs, so expiry is a fixed TTL.
+    """
+
+    def __init__(self, ttl=60.0, negative_ttl=5.0, workers=32):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.workers = workers
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _lookup(self, host, family):
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, None, family, socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            error = None
+        except OSError as e:
+            addresses = []
+            error = e.strerror or str(e)
+        except UnicodeError as e:
+            # IDNA encoding failed, e.g. a label longer than 63 characters
+            addresses = []
+            error = f"invalid hostname ({e})"
+        return Resolution(addresses, time.perf_counter() - start, False, error)
+
+    def resolve(self, host, family=socket.AF_UNSPEC):
+        """Resolve host -> Resolution; IP literals return immediately"""
+        try:
+            ip = ipaddress.ip_address(host)
+            if family == socket.AF_UNSPEC or family == (socket.AF_INET if ip.version == 4 else socket.AF_INET6):
+                return Resolution([host], 0.0, True, None)
+        except ValueError:
+            pass
+
+        key = (host, family)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]._replace(seconds=0.0, cached=True)
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()._replace(cached=True)
+
+        try:
+            result = self._lookup(host, family)
+        except BaseException as e:
+            # Never leave waiters (or later lookups of this name) blocked
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            ttl = self.ttl if not result.error else self.negative_ttl
+            self._cache[key] = (time.monotonic() + ttl, result)
+            del self._inflight[key]
+        future.set_result(result)
+        return result
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def resolve_many(self, hosts, family=socket.AF_UNSPEC):
+        """Resolve many names concurrently. Returns dict host -> Resolution"""
+        hosts = list(dict.fromkeys(hosts))
+        return dict(zip(hosts, self._executor().map(lambda h: self.resolve(h, family), hosts)))
+
+    async def resolve_async(self, host, family=socket.AF_UNSPEC):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), self.resolve, host, family)
+
+# Shared by every check in this process
+RESOLVER = Resolver()
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+def icmp_checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def open_icmp_socket():
     """
-    Ping a host to check connectivity.
+    Unprivileged ICMP echo socket (Linux, needs gid in net.ipv4.ping_group_range).
+    Raises OSError when not permitted.
+    """
+    return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+
+def icmp_available():
+    try:
+        open_icmp_socket().close()
+        return True
+    except OSError:
+        return False
+
+def ping_many(hosts, count=1, interval=0.0, timeout=2.0):
+    """
+    Send `count` ICMP echoes to every host over ONE datagram socket and match
+    replies by (source address, sequence). Returns dict host -> list of RTTs (ms);
+    hosts without an IPv4 address (unresolvable or IPv6-only) map to None. Raises OSError if ICMP sockets are not permitted.
+    """
+    sock = open_icmp_socket()
+    try:
+        # Room for a whole round of replies arriving at once
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        results = {}
+        addrs = {}
+        for host, res in RESOLVER.resolve_many(hosts, socket.AF_INET).items():
+            if res.addresses:
+                addrs[host] = res.addresses[0]
+                results[host] = []
+            else:
+                results[host] = None
+
+        # Kernel rewrites the echo id to the socket's port; sequence numbers
+        # are unique across all outstanding echoes on this socket
+        seqs = itertools.count(1)
+        pending = {}
+        sends = deque((n, host) for n in range(count) for host in addrs)
+        next_round = 0
+        now = time.perf_counter()
+        next_send = now
+        deadline = now + timeout
+
+        while sends or pending:
+            now = time.perf_counter()
+            if sends and now >= next_send:
+                # Send one round: one echo per host
+                while sends and sends[0][0] == next_round:
+                    _, host = sends.popleft()
+                    seq = next(seqs) & 0xffff
+                    payload = struct.pack("!d", now)
+                    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+                    packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, icmp_checksum(header + payload), 0, seq) + payload
+                    try:
+                        sock.sendto(packet, (addrs[host], 0))
+                        pending[seq] = (host, time.perf_counter())
+                    except OSError:
+                        pass
+                next_round += 1
+                next_send = now + interval
+                deadline = time.perf_counter() + timeout
+
+            if not sends and (not pending or now >= deadline):
+                break
+
+            wait = deadline - now
+            if sends:
+                wait = min(wait, next_send - now)
+            ready, _, _ = select.select([sock], [], [], max(0.0, wait))
+            if not ready:
+                continue
+
+            data, (src, _) = sock.recvfrom(1024)
+            received = time.perf_counter()
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, _, seq = struct.unpack("!BBHHH", data[:8])
+            entry = pending.get(seq)
+            if icmp_type != ICMP_ECHO_REPLY or not entry or addrs[entry[0]] != src:
+                continue
+            del pending[seq]
+            results[entry[0]].append((received - entry[1]) * 1000)
+        return results
+    finally:
+        sock.close()
+
+def subprocess_ping(host):
+    """
+    Ping a host with the system ping binary.
     """
     param = '-n' if platform.system().lower() == 'windows' else '-c'
     command = ['ping', param, '1', host]
@@ -21,15 +220,366 @@ def check_ping(host):
     except Exception:
         return False
 
-def check_port(host, port):
+def check_ping(host):
+    """
+    Ping a host to check connectivity (in-process ICMP, falling back to the ping binary).
+    """
+    return check_ping_many([host])[host]
+
+def check_ping_many(hosts, timeout=2.0):
+    """
+    Ping many hosts at once. Returns dict host -> bool.
+    """
+    try:
+        rtts = ping_many(hosts, count=1, timeout=timeout)
+    except OSError:
+        rtts = dict.fromkeys(hosts)
+    status = {host: bool(r) for host, r in rtts.items()}
+    # IPv6-only hosts (and ICMP sockets not permitted): let the ping binary try
+    fallback = [host for host, r in rtts.items() if r is None]
+    if fallback:
+        with ThreadPoolExecutor(max_workers=min(32, len(fallback))) as pool:
+            status.update(zip(fallback, pool.map(subprocess_ping, fallback)))
+    return status
+
+def check_port(host, port, timeout=2.0):
+    """
+    Check if a TCP port is open. The name is resolved through RESOLVER, so
+    the DNS time is measured separately from the connect.
+    Returns a result dict shaped like a --scan result.
+    """
+    res = RESOLVER.resolve(host)
+    result = {
+        "host": host,
+        "port": int(port),
+        "address": res.addresses[0] if res.addresses else None,
+        "open": False,
+        "dns_ms": round(res.seconds * 1000, 2),
+        "dns_cached": res.cached,
+        "time_ms": 0.0,
+        "error": None,
+    }
+    if not res.addresses:
+        result["error"] = f"dns: {res.error}"
+        return result
+
+    family = socket.AF_INET6 if ':' in result["address"] else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    start = time.perf_counter()
+    try:
+        code = sock.connect_ex((result["address"], int(port)))
+    except OSError as e:
+        code = e.errno or -1
+    finally:
+        sock.close()
+    result["time_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    result["open"] = code == 0
+    if code:
+        result["error"] = "timeout" if code in (-1, errno.EAGAIN) else os.strerror(code)
+    return result
+
+def parse_ports(spec):
+    """
+    Parse a port spec like '22', '80-90' or '22,80,8000-8010'.
+    """
+    ports = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ports.extend(range(int(start), int(end) + 1))
+        else:
+            ports.append(int(part))
+    for port in ports:
+        if not 0 < port < 65536:
+            raise ValueError(f"Invalid port: {port}")
+    return ports
+
+def split_target(entry):
+    """
+    Split 'host:ports', '[v6addr]:ports' or a bare host/CIDR into (host, port_spec or None).
+    """
+    if entry.startswith('['):
+        host, _, rest = entry[1:].partition(']')
+        return host, rest[1:] if rest.startswith(':') else None
+    if entry.count(':') == 1:
+        host, port_spec = entry.split(':')
+        return host, port_spec
+    return entry, None
+
+def expand_targets(lines, default_ports=None):
+    """
+    Lazily expand target lines into (host, port) pairs.
+    Lines may be host, host:port, host:80-90, CIDR:22,443; '#' starts a comment.
+    """
+    for line in lines:
+        entry = line.split('#', 1)[0].strip()
+        if not entry:
+            continue
+        host, port_spec = split_target(entry)
+        ports = parse_ports(port_spec) if port_spec else default_ports
+        if not ports:
+            raise ValueError(f"No port given for '{entry}' (use host:port or --ports)")
+
+        if '/' in host:
+            network = ipaddress.ip_network(host, strict=False)
+            hosts = network.hosts() if network.num_addresses > 2 else iter(network)
+        else:
+            hosts = [host]
+
+        for h in hosts:
+            for port in ports:
+                yield str(h), port
+
+async def check_port_async(host, port, timeout=2.0):
+    """
+    Try a TCP connect. Returns (is_open, seconds, error or None).
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return False, loop.time() - start, "timeout"
+    except OSError as e:
+        reason = os.strerror(e.errno) if e.errno else str(e)
+        return False, loop.time() - start, reason
+    elapsed = loop.time() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, elapsed, None
+
+async def scan_targets(targets, on_result, concurrency=100, timeout=2.0):
+    """
+    Check (host, port) pairs with at most `concurrency` connects in flight.
+    Workers pull from the shared iterator, so huge CIDR/port expansions are
+    never materialized; on_result is called as each check completes.
+    """
+    targets = iter(targets)
+
+    async def worker():
+        for host, port in targets:
+            res = await RESOLVER.resolve_async(host)
+            if res.addresses:
+                is_open, elapsed, error = await check_port_async(res.addresses[0], port, timeout)
+            else:
+                is_open, elapsed, error = False, 0.0, f"dns: {res.error}"
+            on_result({
+                "host": host,
+                "port": port,
+                "address": res.addresses[0] if res.addresses else None,
+                "open": is_open,
+                "dns_ms": round(res.seconds * 1000, 2),
+                "dns_cached": res.cached,
+                "time_ms": round(elapsed * 1000, 2),
+                "error": error,
+            })
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+def run_scan(args):
     """
-    Check if a TCP port is open.
+    Scan targets from a file (or stdin with '-') and stream results.
+    Returns number of closed/unreachable targets.
     """
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(2) # 2 second timeout
-    result = sock.connect_ex((host, int(port)))
-    sock.close()
-    return result == 0
+    default_ports = parse_ports(args.ports) if args.ports else None
+    source = sys.stdin if args.scan == '-' else open(args.scan, 'r')
+    counts = {"open": 0, "closed": 0}
+
+    def on_result(result):
+        counts["open" if result["open"] else "closed"] += 1
+        if args.json:
+            print(json.dumps(result), flush=True)
+        elif result["open"]:
+            print(f"[+] {result['host']}:{result['port']} OPEN (dns {result['dns_ms']} ms, connect {result['time_ms']} ms)", flush=True)
+        else:
+            print(f"[-] {result['host']}:{result['port']} CLOSED/FILTERED ({result['error']})", flush=True)
+
+    try:
+        targets = expand_targets(source, default_ports)
+        asyncio.run(scan_targets(targets, on_result, args.concurrency, args.timeout))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    if not args.json:
+        print(f"\n[*] Scan complete: {counts['open']} open, {counts['closed']} closed/filtered.")
+    return counts["closed"]
+
+class LatencyStats:
+    """
+    Streaming latency summary: min/avg/max and jitter in O(1), percentiles from
+    a log-bucketed histogram (~1% relative error), so memory stays bounded
+    no matter how many samples are added.
+    """
+    GROWTH = 1.01
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.jitter_total = 0.0
+        self.last = None
+        self.buckets = {}
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        if self.last is not None:
+            self.jitter_total += abs(ms - self.last)
+        self.last = ms
+        index = int(math.log(max(ms, 0.001) * 1000, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * pct / 100.0))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Bucket midpoint, clamped to observed range
+                value = (self.GROWTH ** (index + 0.5)) / 1000
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": round(self.min, 3),
+            "avg": round(self.total / self.count, 3),
+            "p50": round(self.percentile(50), 3),
+            "p95": round(self.percentile(95), 3),
+            "p99": round(self.percentile(99), 3),
+            "max": round(self.max, 3),
+            "jitter": round(self.jitter_total / (self.count - 1), 3) if self.count > 1 else 0.0,
+        }
+
+async def measure_tcp_latency(host, port, count, interval, timeout):
+    """
+    Time `count` TCP connects to host:port. Returns (LatencyStats, failures).
+    """
+    stats = LatencyStats()
+    failures = 0
+    for n in range(count):
+        if n:
+            await asyncio.sleep(interval)
+        is_open, elapsed, _ = await check_port_async(host, port, timeout)
+        if is_open:
+            stats.add(elapsed * 1000)
+        else:
+            failures += 1
+    return stats, failures
+
+PING_TIME_RE = re.compile(r"time[=<]([\d.]+)\s*ms")
+
+async def measure_icmp_latency(host, count, interval, timeout):
+    """
+    ICMP RTTs, in-process when permitted, else from the system ping.
+    Returns (LatencyStats, failures), or None if neither is available.
+    """
+    try:
+        rtts = (await asyncio.to_thread(ping_many, [host], count, interval, timeout))[host]
+    except OSError:
+        rtts = None
+    if rtts is None:
+        # ICMP sockets not permitted, or no IPv4 address (ping handles IPv6)
+        rtts = await subprocess_ping_rtts(host, count, interval, timeout)
+    if rtts is None:
+        return None
+    stats = LatencyStats()
+    for rtt in rtts:
+        stats.add(rtt)
+    return stats, count - stats.count
+
+async def subprocess_ping_rtts(host, count, interval, timeout):
+    command = ['ping', '-c', str(count), '-W', str(max(1, int(math.ceil(timeout)))), host]
+    if interval >= 0.2:
+        # Shorter intervals need root on most systems
+        command[1:1] = ['-i', str(interval)]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError:
+        return None
+    out, _ = await proc.communicate()
+    return [float(m.group(1)) for m in PING_TIME_RE.finditer(out.decode(errors='replace'))]
+
+async def measure_latency(targets, count, interval, timeout, icmp=False):
+    """
+    Measure all targets concurrently. Returns list of result dicts (ms units).
+    """
+    async def one(host, port):
+        result = {"host": host, "port": port, "sent": count}
+        # Resolve once up front so DNS time is reported apart from connect time
+        res = await RESOLVER.resolve_async(host)
+        result["address"] = res.addresses[0] if res.addresses else None
+        result["dns_ms"] = round(res.seconds * 1000, 3)
+        if not res.addresses:
+            result["error"] = f"dns: {res.error}"
+            return result
+        if port:
+            stats, failures = await measure_tcp_latency(res.addresses[0], port, count, interval, timeout)
+            result["tcp"] = dict(stats.summary(), failed=failures)
+        if icmp or not port:
+            measured = await measure_icmp_latency(host, count, interval, timeout)
+            if measured:
+                stats, failures = measured
+                result["icmp"] = dict(stats.summary(), failed=failures)
+            else:
+                result["icmp"] = {"count": 0, "failed": count, "error": "ping unavailable"}
+        return result
+
+    return await asyncio.gather(*(one(host, port) for host, port in targets))
+
+def print_latency(results):
+    header = f"{'TARGET':<30} {'TYPE':<5} {'OK':>7} {'MIN':>8} {'AVG':>8} {'P50':>8} {'P95':>8} {'P99':>8} {'MAX':>8} {'JITTER':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        target = f"{r['host']}:{r['port']}" if r['port'] else r['host']
+        if r.get('error'):
+            print(f"{target:<30} {r['error']}")
+            continue
+        print(f"{target:<30} {'DNS':<5} {'':>7} {r['dns_ms']:>8.2f}  -> {r['address']}")
+        for kind in ("tcp", "icmp"):
+            s = r.get(kind)
+            if s is None:
+                continue
+            ok = f"{s['count']}/{r['sent']}"
+            if not s['count']:
+                print(f"{target:<30} {kind.upper():<5} {ok:>7} ({s.get('error', 'no replies')})")
+                continue
+            print(f"{target:<30} {kind.upper():<5} {ok:>7} {s['min']:>8.2f} {s['avg']:>8.2f} {s['p50']:>8.2f} "
+                  f"{s['p95']:>8.2f} {s['p99']:>8.2f} {s['max']:>8.2f} {s['jitter']:>8.2f}")
+    print("(times in ms)")
+
+def run_latency(args):
+    targets = []
+    for entry in args.latency:
+        host, port_spec = split_target(entry)
+        ports = parse_ports(port_spec) if port_spec else [None]
+        targets.extend((host, port) for port in ports)
+
+    if not args.json:
+        print(f"[*] Measuring latency to {len(targets)} target(s), {args.count} probes each...")
+    results = asyncio.run(measure_latency(targets, args.count, args.interval, args.timeout, args.icmp))
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print_latency(results)
 
 def get_public_ip():
     """
@@ -46,9 +596,20 @@ def get_public_ip():
 def main():
     parser = argparse.ArgumentParser(description="NetCheck: Network Diagnostic Tool")
     
-    parser.add_argument("--ping", help="Host to ping")
+    parser.add_argument("--ping", nargs='+', metavar="HOST", help="Host(s) to ping")
     parser.add_argument("--port", help="Check port (format: host:port or port for localhost)")
     parser.add_argument("--ip", action="store_true", help="Get Public IP")
+    parser.add_argument("--scan", metavar="FILE", help="Scan targets from file ('-' for stdin): host, host:port, host:80-90, CIDR:22")
+    parser.add_argument("--ports", help="Default ports for scan targets without one (e.g. 22,80,443 or 8000-8010)")
+    parser.add_argument("--concurrency", type=int, default=100, help="Max simultaneous connects for --scan (default: 100)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Per-target timeout in seconds (default: 2.0)")
+    parser.add_argument("--json", action="store_true", help="Output JSON (JSON lines in scan mode)")
+    parser.add_argument("--latency", nargs='+', metavar="TARGET", help="Measure latency to host:port (TCP connect) or host (ICMP)")
+    parser.add_argument("--count", type=int, default=10, help="Probes per target for --latency (default: 10)")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between probes for --latency (default: 0.2)")
+    parser.add_argument("--icmp", action="store_true", help="Also measure ICMP RTT for host:port targets")
+    parser.add_argument("--dns-ttl", type=float, default=60.0, help="Seconds to cache DNS answers (default: 60)")
+    parser.add_argument("--dns-workers", type=int, default=32, help="Concurrent DNS lookups (default: 32)")
     
     args = parser.parse_args()
     
@@ -56,17 +617,30 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    RESOLVER.ttl = args.dns_ttl
+    RESOLVER.workers = args.dns_workers
+
     if args.ip:
-        print("[*] limit resolving Public IP...")
+        if not args.json:
+            print("[*] limit resolving Public IP...")
         ip = get_public_ip()
-        print(f"Public IP: {ip}")
+        if args.json:
+            print(json.dumps({"public_ip": ip}))
+        else:
+            print(f"Public IP: {ip}")
 
     if args.ping:
-        print(f"[*] Pinging {args.ping}...")
-        if check_ping(args.ping):
-            print(f"[+] {args.ping} is UP")
+        if not args.json:
+            print(f"[*] Pinging {', '.join(args.ping)}...")
+        status = check_ping_many(args.ping, timeout=args.timeout)
+        if args.json:
+            print(json.dumps({"ping": status}))
         else:
-            print(f"[-] {args.ping} is DOWN")
+            for host, up in status.items():
+                if up:
+                    print(f"[+] {host} is UP")
+                else:
+                    print(f"[-] {host} is DOWN")
 
     if args.port:
         if ':' in args.port:
@@ -75,11 +649,31 @@ def main():
             host = '127.0.0.1'
             port = args.port
             
-        print(f"[*] Checking {host}:{port}...")
-        if check_port(host, port):
-            print(f"[+] Port {port} on {host} is OPEN")
+        if not args.json:
+            print(f"[*] Checking {host}:{port}...")
+        result = check_port(host, port, timeout=args.timeout)
+        dns = f"dns {result['dns_ms']:.2f} ms{' (cached)' if result['dns_cached'] else ''}"
+        if args.json:
+            print(json.dumps(result))
+        elif result["open"]:
+            print(f"[+] Port {port} on {host} is OPEN (connect {result['time_ms']:.2f} ms, {dns})")
         else:
-            print(f"[-] Port {port} on {host} is CLOSED/FILTERED")
+            print(f"[-] Port {port} on {host} is CLOSED/FILTERED ({result['error']}, {dns})")
+
+    if args.latency:
+        try:
+            run_latency(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    if args.scan:
+        try:
+            failed = run_scan(args)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(1 if failed else 0)
 
 if __name__ == "__main__":
     main()
@@ -2,6 +2,12 @@ import psutil
 import socket
 import argparse
 import sys
+import os
+import time
+import json
+import heapq
+import ipaddress
+from collections import namedtuple, Counter
 from datetime import datetime
 
 # Try to import colorama
@@ -21,26 +27,290 @@ except ImportError:
     class Style:
         RESET_ALL = ""
         BRIGHT = ""
-    print("Suggestion: Install 'colorama' for colored output: pip install colorama")
+    print("Suggestion: Install 'colorama' for colored output: pip install colorama", file=sys.stderr)
 
-def get_service_name(port, proto):
+SERVICES_FILE = "/etc/services"
+
+# Used when /etc/services is missing (minimal containers)
+DEFAULT_SERVICES = {
+    (20, "tcp"): "ftp-data", (21, "tcp"): "ftp", (22, "tcp"): "ssh",
+    (23, "tcp"): "telnet", (25, "tcp"): "smtp", (53, "tcp"): "domain",
+    (53, "udp"): "domain", (67, "udp"): "bootps", (68, "udp"): "bootpc",
+    (80, "tcp"): "http", (110, "tcp"): "pop3", (123, "udp"): "ntp",
+    (143, "tcp"): "imap2", (161, "udp"): "snmp", (389, "tcp"): "ldap",
+    (443, "tcp"): "https", (443, "udp"): "https", (465, "tcp"): "submissions",
+    (514, "udp"): "syslog", (587, "tcp"): "submission", (636, "tcp"): "ldaps",
+    (873, "tcp"): "rsync", (993, "tcp"): "imaps", (995, "tcp"): "pop3s",
+    (1194, "udp"): "openvpn", (1812, "udp"): "radius", (2049, "tcp"): "nfs",
+    (3306, "tcp"): "mysql", (5353, "udp"): "mdns", (5432, "tcp"): "postgresql",
+    (6379, "tcp"): "redis", (8080, "tcp"): "http-alt", (9100, "tcp"): "jetdirect",
+    (11211, "tcp"): "memcache", (27017, "tcp"): "mongodb",
+}
+
+# (port, proto) -> service name, loaded once by load_services()
+_service_names = None
+
+def load_services(path=SERVICES_FILE):
+    """Parse a services(5) file into {(port, proto): name}; first entry wins like getservbyport"""
+    services = {}
     try:
-        return socket.getservbyport(port, proto)
-    except:
-        return "?"
+        with open(path, "r") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if len(fields) < 2 or "/" not in fields[1]:
+                    continue
+                port, _, proto = fields[1].partition("/")
+                if not port.isdigit():
+                    continue
+                services.setdefault((int(port), proto.lower()), fields[0])
+    except OSError:
+        return dict(DEFAULT_SERVICES)
+    return services or dict(DEFAULT_SERVICES)
+
+def get_service_name(port, proto):
+    global _service_names
+    if _service_names is None:
+        _service_names = load_services()
+    return _service_names.get((port, proto), "?")
+
+# Kernel TCP state codes (include/net/tcp_states.h) -> psutil status names
+TCP_STATES = {
+    "01": "ESTABLISHED",
+    "02": "SYN_SENT",
+    "03": "SYN_RECV",
+    "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2",
+    "06": "TIME_WAIT",
+    "07": "CLOSE",
+    "08": "CLOSE_WAIT",
+    "09": "LAST_ACK",
+    "0A": "LISTEN",
+    "0B": "CLOSING",
+}
+
+PROC_NET_TABLES = [
+    ("tcp", socket.AF_INET, socket.SOCK_STREAM),
+    ("tcp6", socket.AF_INET6, socket.SOCK_STREAM),
+    ("udp", socket.AF_INET, socket.SOCK_DGRAM),
+    ("udp6", socket.AF_INET6, socket.SOCK_DGRAM),
+]
+
+# Same field names as psutil's sconn/addr so audit_ports works on either source
+Addr = namedtuple("Addr", ["ip", "port"])
+Conn = namedtuple("Conn", ["fd", "family", "type", "laddr", "raddr", "status", "pid"])
+
+# pid -> process name, filled lazily by get_process_name
+_process_names = {}
 
 def get_process_name(pid):
     if not pid:
         return "-"
-    try:
-        return psutil.Process(pid).name()
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        return "Unknown"
+    name = _process_names.get(pid)
+    if name is None:
+        try:
+            name = psutil.Process(pid).name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            name = "Unknown"
+        _process_names[pid] = name
+    return name
+
+def decode_address(hex_addr, family):
+    """Decode an ADDR:PORT field from /proc/net/* (address in host byte order words)"""
+    ip_hex, port_hex = hex_addr.split(":")
+    raw = bytes.fromhex(ip_hex)
+    # The kernel prints each 32-bit word in native (little-endian) order
+    raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    return Addr(socket.inet_ntop(family, raw), int(port_hex, 16))
+
+def build_inode_pid_map(proc_root="/proc"):
+    """
+    Map socket inode -> pid with a single sweep over /proc/*/fd.
+    Processes we cannot inspect (other users without root) are skipped.
+    """
+    inodes = {}
+    for entry in os.listdir(proc_root):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            with os.scandir(os.path.join(proc_root, entry, "fd")) as fds:
+                for fd in fds:
+                    try:
+                        target = os.readlink(fd.path)
+                    except OSError:
+                        continue
+                    if target.startswith("socket:["):
+                        inodes.setdefault(target[8:-1], pid)
+        except OSError:
+            continue
+    return inodes
+
+def parse_proc_net(path, family, sock_type, inode_pids):
+    """Parse one /proc/net/{tcp,tcp6,udp,udp6} table into Conn tuples"""
+    conns = []
+    with open(path, "r") as f:
+        next(f, None)  # header
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            laddr = decode_address(fields[1], family)
+            raddr = decode_address(fields[2], family)
+            if sock_type == socket.SOCK_STREAM:
+                status = TCP_STATES.get(fields[3], "NONE")
+            else:
+                status = "NONE"
+            if not raddr.port:
+                raddr = ()
+            conns.append(Conn(-1, family, sock_type, laddr, raddr, status, inode_pids.get(fields[9])))
+    return conns
+
+def collect_connections(proc_root="/proc"):
+    """
+    Collect inet connections straight from /proc/net in bulk.
+    Cost is linear in sockets plus processes, unlike per-connection psutil lookups.
+    """
+    inode_pids = build_inode_pid_map(proc_root)
+    conns = []
+    for table, family, sock_type in PROC_NET_TABLES:
+        path = os.path.join(proc_root, "net", table)
+        try:
+            conns.extend(parse_proc_net(path, family, sock_type, inode_pids))
+        except FileNotFoundError:
+            # e.g. IPv6 disabled
+            continue
+    return conns
+
+def get_connections(backend="auto"):
+    """Return inet connections from /proc/net (Linux) or psutil"""
+    if backend == "proc" or (backend == "auto" and os.path.exists("/proc/net/tcp")):
+        return collect_connections()
+    return psutil.net_connections(kind='inet')
+
+def filter_connections(connections, args):
+    """Apply --listen / --port filters"""
+    for conn in connections:
+        if args.listen and conn.status != 'LISTEN':
+            continue
+        if args.port and args.port != conn.laddr.port:
+            continue
+        yield conn
+
+def peer_network(ip):
+    """Collapse a remote address to its /24 (IPv4) or /64 (IPv6) network"""
+    if ip.startswith("::ffff:") and "." in ip:
+        ip = ip[7:]
+    if "." in ip:
+        return ip.rsplit(".", 1)[0] + ".0/24"
+    return str(ipaddress.ip_network(f"{ip}/64", strict=False))
+
+def summarize_connections(connections, top=10):
+    """
+    Aggregate connections by (process, local port, state) and by remote /24.
+    Only counters are kept, so memory is bounded by distinct groups, not sockets.
+    """
+    by_process = Counter()
+    by_peer = Counter()
+    by_state = Counter()
+    total = 0
+
+    for conn in connections:
+        total += 1
+        by_state[conn.status] += 1
+        by_process[(get_process_name(conn.pid), conn.laddr.port, conn.status)] += 1
+        if conn.raddr:
+            by_peer[peer_network(conn.raddr.ip)] += 1
+
+    # nlargest keeps a heap of size `top` instead of sorting every group
+    top_process = heapq.nlargest(top, by_process.items(), key=lambda kv: kv[1])
+    top_peers = heapq.nlargest(top, by_peer.items(), key=lambda kv: kv[1])
+
+    return {
+        "total": total,
+        "states": dict(by_state),
+        "by_process": [
+            {"process": proc, "port": port, "status": status, "count": count}
+            for (proc, port, status), count in top_process
+        ],
+        "by_peer": [{"network": net, "count": count} for net, count in top_peers],
+    }
+
+def print_summary(summary):
+    print(f"\n{Style.BRIGHT}Total connections: {summary['total']}{Style.RESET_ALL}")
+    print("States: " + ", ".join(f"{k}={v}" for k, v in sorted(summary["states"].items())))
+
+    header = f"{'COUNT':<8} {'PORT':<8} {'STATUS':<15} {'PROCESS'}"
+    print(f"\n{Style.BRIGHT}{header}{Style.RESET_ALL}")
+    print("-" * len(header))
+    for row in summary["by_process"]:
+        print(f"{row['count']:<8} {row['port']:<8} {row['status']:<15} {Fore.MAGENTA}{row['process']}{Style.RESET_ALL}")
+
+    if summary["by_peer"]:
+        header = f"{'COUNT':<8} {'REMOTE NETWORK'}"
+        print(f"\n{Style.BRIGHT}{header}{Style.RESET_ALL}")
+        print("-" * len(header))
+        for row in summary["by_peer"]:
+            print(f"{row['count']:<8} {row['network']}")
+
+def stream_json(connections):
+    """Write one JSON object per connection, without building the whole report"""
+    write = sys.stdout.write
+    dumps = json.dumps
+    for conn in connections:
+        proto = "tcp" if conn.type == socket.SOCK_STREAM else "udp"
+        write(dumps({
+            "proto": proto,
+            "local_ip": conn.laddr.ip,
+            "local_port": conn.laddr.port,
+            "remote_ip": conn.raddr.ip if conn.raddr else None,
+            "remote_port": conn.raddr.port if conn.raddr else None,
+            "status": conn.status,
+            "pid": conn.pid,
+            "process": get_process_name(conn.pid),
+        }) + "\n")
+
+def format_connection(conn):
+    """One colored table row of the audit listing"""
+    laddr = f"{conn.laddr.ip}"
+    lport = conn.laddr.port
+        
+    proto = "TCP" if conn.type == socket.SOCK_STREAM else "UDP"
+    status = conn.status
+    pid = conn.pid
+    
+    proc_name = get_process_name(pid)
+    service = get_service_name(lport, proto.lower())
+    
+    # Color logic
+    status_color = Fore.GREEN if status == 'LISTEN' else Fore.YELLOW
+    if status == 'ESTABLISHED':
+        status_color = Fore.BLUE
+        
+    port_color = Fore.CYAN if lport < 1024 else Fore.WHITE
+    
+    # Format line
+    return f"{proto:<5} {laddr:<20} {port_color}{lport:<8}{Style.RESET_ALL} {status_color}{status:<15}{Style.RESET_ALL} {pid or '-':<8} {Fore.MAGENTA}{proc_name}{Style.RESET_ALL} ({service})"
 
 def audit_ports(args):
     """
     Scan local network connections.
     """
+    _process_names.clear()
+
+    if args.summary:
+        if not args.json:
+            print(f"{Fore.CYAN}[*] Summarizing Local Connections...{Style.RESET_ALL}")
+        summary = summarize_connections(filter_connections(get_connections(args.backend), args), args.top)
+        if args.json:
+            print(json.dumps(summary))
+        else:
+            print_summary(summary)
+        return
+
+    if args.json:
+        stream_json(filter_connections(get_connections(args.backend), args))
+        return
+
     print(f"{Fore.CYAN}[*] Auditing Local Ports...{Style.RESET_ALL}")
     
     # Header
@@ -48,52 +318,211 @@ def audit_ports(args):
     print(f"\n{Style.BRIGHT}{header}{Style.RESET_ALL}")
     print("-" * len(header))
     
-    connections = psutil.net_connections(kind='inet')
+    connections = get_connections(args.backend)
     
     # Sort: Listen first, then by port
     connections.sort(key=lambda x: (x.status != 'LISTEN', x.laddr.port))
     
     count_open = 0
     
-    for conn in connections:
-        if args.listen and conn.status != 'LISTEN':
-            continue
-            
-        laddr = f"{conn.laddr.ip}"
-        lport = conn.laddr.port
-        
-        # Filter logic
-        if args.port and args.port != lport:
-            continue
-            
-        proto = "TCP" if conn.type == socket.SOCK_STREAM else "UDP"
-        status = conn.status
-        pid = conn.pid
-        
-        proc_name = get_process_name(pid)
-        service = get_service_name(lport, proto.lower())
-        
-        # Color logic
-        status_color = Fore.GREEN if status == 'LISTEN' else Fore.YELLOW
-        if status == 'ESTABLISHED':
-            status_color = Fore.BLUE
-            
-        port_color = Fore.CYAN if lport < 1024 else Fore.WHITE
+    for conn in filter_connections(connections, args):
+        print(format_connection(conn))
         
-        # Format line
-        line = f"{proto:<5} {laddr:<20} {port_color}{lport:<8}{Style.RESET_ALL} {status_color}{status:<15}{Style.RESET_ALL} {pid or '-':<8} {Fore.MAGENTA}{proc_name}{Style.RESET_ALL} ({service})"
-        print(line)
-        
-        if status == 'LISTEN':
+        if conn.status == 'LISTEN':
             count_open += 1
             
     print(f"\n{Fore.GREEN}[+] Found {count_open} listening ports.{Style.RESET_ALL}")
 
+def proto_name(conn):
+    return "tcp" if conn.type == socket.SOCK_STREAM else "udp"
+
+def take_snapshot(args):
+    """
+    Reduce current connections to keyed sets for diffing.
+    Only the latest snapshot is retained by watch_ports, so memory is
+    bounded by the live socket count regardless of how long it runs.
+    """
+    _process_names.clear()  # PIDs get reused over long runs
+    listeners = {}
+    active = set()
+    per_process = Counter()
+
+    for conn in filter_connections(get_connections(args.backend), args):
+        proc = get_process_name(conn.pid)
+        if conn.status == 'LISTEN' or (conn.type == socket.SOCK_DGRAM and not conn.raddr):
+            key = (proto_name(conn), conn.laddr.ip, conn.laddr.port, conn.pid)
+            listeners[key] = proc
+        elif conn.raddr:
+            active.add((proto_name(conn), conn.laddr, conn.raddr, conn.pid))
+            per_process[(conn.pid, proc)] += 1
+
+    return {"listeners": listeners, "active": active, "per_process": per_process}
+
+def diff_snapshots(prev, cur, interval, top=10):
+    """Compute listener churn and per-process connection deltas between two snapshots"""
+    opened = [k + (cur["listeners"][k],) for k in cur["listeners"].keys() - prev["listeners"].keys()]
+    closed = [k + (prev["listeners"][k],) for k in prev["listeners"].keys() - cur["listeners"].keys()]
+
+    new_conns = Counter()
+    for _, _, _, pid in cur["active"] - prev["active"]:
+        new_conns[pid] += 1
+
+    deltas = []
+    for key in cur["per_process"].keys() | prev["per_process"].keys():
+        pid, proc = key
+        now = cur["per_process"].get(key, 0)
+        delta = now - prev["per_process"].get(key, 0)
+        fresh = new_conns.get(pid, 0)
+        if delta or fresh:
+            deltas.append({
+                "pid": pid,
+                "process": proc,
+                "connections": now,
+                "delta": delta,
+                "new_per_sec": round(fresh / interval, 2),
+            })
+
+    deltas = heapq.nlargest(top, deltas, key=lambda d: (d["new_per_sec"], abs(d["delta"])))
+
+    def listener_dict(item):
+        proto, ip, port, pid, proc = item
+        return {"proto": proto, "ip": ip, "port": port, "pid": pid, "process": proc}
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "opened": [listener_dict(i) for i in sorted(opened, key=lambda i: i[2])],
+        "closed": [listener_dict(i) for i in sorted(closed, key=lambda i: i[2])],
+        "processes": deltas,
+    }
+
+def print_diff(diff):
+    if not (diff["opened"] or diff["closed"] or diff["processes"]):
+        return
+    print(f"\n{Style.BRIGHT}[{diff['timestamp']}]{Style.RESET_ALL}")
+    for l in diff["opened"]:
+        print(f"{Fore.GREEN}+ LISTEN {l['proto'].upper():<4} {l['ip']}:{l['port']} {Fore.MAGENTA}{l['process']}{Style.RESET_ALL} ({l['pid'] or '-'})")
+    for l in diff["closed"]:
+        print(f"{Fore.RED}- LISTEN {l['proto'].upper():<4} {l['ip']}:{l['port']} {Fore.MAGENTA}{l['process']}{Style.RESET_ALL} ({l['pid'] or '-'})")
+    for p in diff["processes"]:
+        color = Fore.YELLOW if p["delta"] > 0 else Fore.WHITE
+        print(f"{color}  {p['process']} ({p['pid'] or '-'}): {p['connections']} conns ({p['delta']:+d}), {p['new_per_sec']} new/s{Style.RESET_ALL}")
+
+def watch_ports(args):
+    """Poll connections every args.watch seconds and print only the changes"""
+    if not args.json:
+        print(f"{Fore.CYAN}[*] Watching connections every {args.watch}s (Ctrl+C to stop)...{Style.RESET_ALL}")
+
+    prev = take_snapshot(args)
+    if not args.json:
+        print(f"[+] Baseline: {len(prev['listeners'])} listeners, {len(prev['active'])} connections.")
+
+    try:
+        while True:
+            time.sleep(args.watch)
+            cur = take_snapshot(args)
+            diff = diff_snapshots(prev, cur, args.watch, args.top)
+            prev = cur
+            if args.json:
+                print(json.dumps(diff), flush=True)
+            else:
+                print_diff(diff)
+    except KeyboardInterrupt:
+        if not args.json:
+            print("\n[!] Watch stopped.")
+
+def build_fake_proc(root, count, sockets_per_process=100):
+    """
+    Write a synthetic /proc under root: net/tcp with `count` sockets (every
+    tenth one listening) and /proc/<pid>/fd links owning them. Returns the
+    number of processes. PIDs are above pid_max, so name lookups miss.
+    """
+    os.makedirs(os.path.join(root, "net"))
+    processes = 0
+    with open(os.path.join(root, "net", "tcp"), "w") as f:
+        f.write("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n")
+        for i in range(count):
+            inode = 100000 + i
+            lport = (i % 65535) + 1
+            if i % 10 == 0:
+                remote, state = "00000000:0000", "0A"
+            else:
+                remote, state = f"{0x0A000000 + i:08X}:{(i * 7) % 65535 + 1:04X}", "01"
+            f.write(f"{i:4}: 0100007F:{lport:04X} {remote} {state} 00000000:00000000 00:00000000 00000000  1000        0 {inode} 1 0000000000000000 20 4 30 10 -1\n")
+            if i % sockets_per_process == 0:
+                fd_dir = os.path.join(root, str(5000000 + processes), "fd")
+                os.makedirs(fd_dir)
+                processes += 1
+            os.symlink(f"socket:[{inode}]", os.path.join(fd_dir, str(i % sockets_per_process)))
+    return processes
+
+def run_benchmark(count):
+    """
+    Time each stage of an audit over `count` synthetic sockets: bulk
+    collection from a fake /proc, the per-connection listing loop, and the
+    summary aggregation. Then compare service lookups against getservbyport.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="portaudit-bench-") as root:
+        processes = build_fake_proc(root, count)
+        print(f"[*] Benchmarking the audit loop over {count} sockets owned by {processes} processes...")
+        args = argparse.Namespace(listen=False, port=None)
+        _process_names.clear()
+        timings = []
+
+        start = time.perf_counter()
+        connections = collect_connections(root)
+        timings.append(("collect (/proc/net + fd sweep)", time.perf_counter() - start))
+
+        start = time.perf_counter()
+        with open(os.devnull, "w") as sink:
+            connections.sort(key=lambda x: (x.status != 'LISTEN', x.laddr.port))
+            for conn in filter_connections(connections, args):
+                print(format_connection(conn), file=sink)
+        timings.append(("listing loop (pid name, service, format)", time.perf_counter() - start))
+
+        _process_names.clear()
+        start = time.perf_counter()
+        summarize_connections(filter_connections(connections, args))
+        timings.append(("summary aggregation", time.perf_counter() - start))
+
+    for label, elapsed in timings:
+        print(f"{label:<42} {elapsed * 1000:8.1f} ms ({elapsed / count * 1e6:.2f} us/socket)")
+    total = sum(elapsed for _, elapsed in timings)
+    print(f"{'total':<42} {total * 1000:8.1f} ms")
+
+    ports = [conn.laddr.port for conn in connections]
+
+    def legacy_lookup(port, proto):
+        try:
+            return socket.getservbyport(port, proto)
+        except OSError:
+            return "?"
+
+    start = time.perf_counter()
+    for port in ports:
+        legacy_lookup(port, "tcp")
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for port in ports:
+        get_service_name(port, "tcp")
+    table = time.perf_counter() - start
+
+    print(f"\nService lookups: getservbyport {legacy * 1000:.1f} ms, table {table * 1000:.1f} ms", end="")
+    print(f" ({legacy / table:.1f}x)" if table else "")
+
 def main():
     parser = argparse.ArgumentParser(description="PortAudit: Process & Port Usage Visualizer")
     
     parser.add_argument("--listen", action="store_true", help="Show ONLY listening ports (default: show all)")
     parser.add_argument("--port", type=int, help="Filter by specific port number")
+    parser.add_argument("--backend", choices=["auto", "proc", "psutil"], default="auto", help="Connection source (default: auto, /proc/net on Linux)")
+    parser.add_argument("--summary", action="store_true", help="Aggregate connections by process/port/state and remote /24")
+    parser.add_argument("--top", type=int, default=10, help="Rows per summary table (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Output JSON (one object per line unless --summary)")
+    parser.add_argument("--watch", type=float, metavar="INTERVAL", help="Print listener and connection churn every INTERVAL seconds")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Benchmark the audit loop over N synthetic sockets and exit")
     
     args = parser.parse_args()
     
@@ -102,6 +531,14 @@ def main():
         print("Error: 'psutil' module is required.")
         sys.exit(1)
 
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+
+    if args.watch:
+        watch_ports(args)
+        return
+
     audit_ports(args)
 
 if __name__ == "__main__":
@@ -1,85 +1,945 @@
 import sys
 import os
-import subprocess
-import datetime
-import shlex
+import json
+import signal
+import socket
+import stat
+import struct
+import time
+import re
 
-HISTORY_FILE = "tool_history.log"
+# Only what `--client` needs is imported here, so the thin client starts
+# fast; everything else is imported by the functions that use it.
+
+HISTORY_FILE = "history.jsonl"
 TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def log_command(tool_name, args):
-    """Log the command execution to history file"""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cmd_str = f"{tool_name} {' '.join(args)}"
-    
+# History, its lock and the tool manifest live here rather than in TOOLS_DIR
+# itself, so TOOLS_DIR's mtime only changes when tools are added or removed
+STATE_DIR = os.path.join(TOOLS_DIR, ".runner")
+HISTORY_PATH = os.path.join(STATE_DIR, HISTORY_FILE)
+
+# Rotate the history file above this size, keeping HISTORY_BACKUPS old files (.1 newest)
+HISTORY_MAX_BYTES = 5 * 1024 * 1024
+HISTORY_BACKUPS = 3
+
+def rotate_history(hist_path):
+    """Shift history -> .1 -> .2 ... once it exceeds HISTORY_MAX_BYTES (caller holds the lock)"""
+    try:
+        if os.path.getsize(hist_path) < HISTORY_MAX_BYTES:
+            return
+    except FileNotFoundError:
+        return
+    for i in range(HISTORY_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{hist_path}.{i}"):
+            os.replace(f"{hist_path}.{i}", f"{hist_path}.{i + 1}")
+    os.replace(hist_path, f"{hist_path}.1")
+
+def log_command(tool_name, args, started, duration, exit_code, peak_rss_kb=None, mode="inprocess"):
+    """
+    Append one run to the JSONL history file. An exclusive fcntl lock on a
+    side file serializes concurrent runners, including rotation.
+    """
+    import datetime
+    import fcntl
+
+    record = {
+        "start": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "tool": tool_name,
+        "args": args,
+        "duration": round(duration, 3),
+        "exit": exit_code,
+        "peak_rss_kb": peak_rss_kb,
+        "mode": mode,
+    }
+    hist_path = HISTORY_PATH
+
     try:
-        with open(os.path.join(TOOLS_DIR, HISTORY_FILE), "a") as f:
-            f.write(f"[{timestamp}] {cmd_str}\n")
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(hist_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            rotate_history(hist_path)
+            with open(hist_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
     except Exception as e:
-        print(f"[!] Warning: Could not write to history file: {e}")
+        print(f"[!] Warning: Could not write to history file: {e}", file=sys.stderr)
+
+def peak_rss_kb():
+    """Peak RSS of this process or any child it has waited for (KB)"""
+    import resource
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+# --- Tool registry -------------------------------------------------------
+
+# Cached tool manifest (in STATE_DIR), rebuilt when TOOLS_DIR's mtime changes
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+ARGUMENT_FLAG_RE = re.compile(r"""add_argument\(\s*['"](--?[\w-]+)['"]""")
+
+# Manifest loaded by this process (shared by dispatch, batch and daemon modes)
+_registry = None
+
+def scan_tool(name):
+    """Manifest entry for tools_dir/<name>/<name>.py, or None if it isn't a tool"""
+    script_path = os.path.join(TOOLS_DIR, name, f"{name}.py")
+    try:
+        mtime = os.stat(script_path).st_mtime_ns
+        with open(script_path, "r", errors="replace") as f:
+            source = f.read()
+    except OSError:
+        return None
+
+    requirements = []
+    try:
+        with open(os.path.join(TOOLS_DIR, name, "requirements.txt"), "r") as f:
+            requirements = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError:
+        pass
+
+    flags = sorted(set(ARGUMENT_FLAG_RE.findall(source)))
+    return {
+        "entry_point": os.path.join(name, f"{name}.py"),
+        "script_mtime": mtime,
+        "requirements": requirements,
+        "flags": flags,
+        "supports_json": "--json" in flags,
+        "has_main": re.search(r"^def main\(", source, re.M) is not None,
+    }
+
+def build_manifest(dir_mtime):
+    """Scan TOOLS_DIR once; runtime stats start empty"""
+    tools = {}
+    for item in sorted(os.listdir(TOOLS_DIR)):
+        if os.path.isdir(os.path.join(TOOLS_DIR, item)):
+            entry = scan_tool(item)
+            if entry:
+                tools[item] = entry
+    return {"version": MANIFEST_VERSION, "dir_mtime": dir_mtime, "tools": tools,
+            "runtimes": {}, "history": {"inode": None, "offset": 0}}
+
+def save_manifest(manifest):
+    """Write the manifest atomically (concurrent runners may read it)"""
+    import tempfile
+
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=STATE_DIR)
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(STATE_DIR, MANIFEST_FILE))
+    except OSError:
+        # Read-only checkout: the registry still works, just uncached
+        pass
+
+def load_registry(force=False):
+    """
+    The tool manifest: taken from this process's memory, else from
+    MANIFEST_FILE, and rebuilt only when TOOLS_DIR's mtime changed
+    (a tool added, removed or renamed).
+    """
+    global _registry
+    try:
+        # Created before taking the mtime, so creating it never invalidates the cache
+        os.makedirs(STATE_DIR, exist_ok=True)
+    except OSError:
+        pass
+    dir_mtime = os.stat(TOOLS_DIR).st_mtime_ns
+    if _registry and _registry["dir_mtime"] == dir_mtime and not force:
+        return _registry
+
+    manifest = None
+    if not force:
+        try:
+            with open(os.path.join(STATE_DIR, MANIFEST_FILE), "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+    if not manifest or manifest.get("version") != MANIFEST_VERSION or manifest.get("dir_mtime") != dir_mtime:
+        previous = manifest if manifest and manifest.get("version") == MANIFEST_VERSION else {}
+        manifest = build_manifest(dir_mtime)
+        # Runtime stats stay valid across rescans
+        manifest["runtimes"] = previous.get("runtimes", {})
+        manifest["history"] = previous.get("history", manifest["history"])
+        save_manifest(manifest)
+    _registry = manifest
+    return manifest
+
+def find_tools():
+    """Names of registered tools"""
+    return list(load_registry()["tools"])
+
+def get_tool(name):
+    """
+    Manifest entry for a tool, or None. Edits to the tool's script (which
+    don't touch the directory mtime) are picked up with a single stat.
+    """
+    registry = load_registry()
+    entry = registry["tools"].get(name)
+    if entry is None:
+        return None
+    try:
+        mtime = os.stat(os.path.join(TOOLS_DIR, entry["entry_point"])).st_mtime_ns
+    except OSError:
+        # Script removed without the directory changing
+        registry["tools"].pop(name)
+        save_manifest(registry)
+        return None
+    if mtime != entry["script_mtime"]:
+        entry = scan_tool(name)
+        if entry is None:
+            # Became unreadable between the stat and the rescan
+            registry["tools"].pop(name)
+        else:
+            registry["tools"][name] = entry
+        save_manifest(registry)
+    return entry
+
+def tool_script(entry):
+    """Absolute path of a tool's entry point"""
+    return os.path.join(TOOLS_DIR, entry["entry_point"])
+
+def update_runtimes(registry):
+    """
+    Fold history lines written since the last call into the per-tool
+    runtime totals. Only new bytes are read; a rotation is detected by the
+    inode change and the rest of the rotated file is read from .1.
+    """
+    hist_path = HISTORY_PATH
+    state = registry["history"]
+    runtimes = registry["runtimes"]
+
+    def consume(path, offset):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written; pick it up next time
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                    stats = runtimes.setdefault(record["tool"], {"runs": 0, "total": 0.0})
+                    stats["runs"] += 1
+                    stats["total"] += float(record["duration"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return offset
+
+    try:
+        inode = os.stat(hist_path).st_ino
+    except FileNotFoundError:
+        return
+    offset = state["offset"]
+    if state["inode"] != inode:
+        try:
+            if state["inode"] is not None and os.stat(f"{hist_path}.1").st_ino == state["inode"]:
+                consume(f"{hist_path}.1", offset)
+        except FileNotFoundError:
+            pass
+        offset = 0
+    new_offset = consume(hist_path, offset)
+    if (inode, new_offset) != (state["inode"], state["offset"]):
+        registry["history"] = {"inode": inode, "offset": new_offset}
+        save_manifest(registry)
 
 def list_tools():
-    """List available tools in the directory"""
+    """List available tools with --json support and average runtime"""
+    registry = load_registry()
+    update_runtimes(registry)
     print("Available Tools:")
-    for item in os.listdir(TOOLS_DIR):
-        if os.path.isdir(os.path.join(TOOLS_DIR, item)):
-            # Check if it has a .py file with the same name
-            main_script = os.path.join(TOOLS_DIR, item, item + ".py")
-            if os.path.exists(main_script):
-                print(f"  - {item}")
-
-def show_history():
-    """Show execution history"""
-    hist_path = os.path.join(TOOLS_DIR, HISTORY_FILE)
-    if not os.path.exists(hist_path):
-        print("No history found.")
+    for name, entry in registry["tools"].items():
+        stats = registry["runtimes"].get(name)
+        avg = f"avg {stats['total'] / stats['runs']:.2f}s over {stats['runs']} run(s)" if stats else ""
+        print(f"  - {name:<12} {'[json]' if entry['supports_json'] else '      '}  {avg}".rstrip())
+
+def parse_since(value):
+    """Epoch seconds from '30m', '2h', '7d' (ago) or an ISO date/time"""
+    import argparse
+    import datetime
+
+    units = {"m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected e.g. 30m, 2h, 7d or 2024-05-01[T12:00], got '{value}'")
+
+def iter_history():
+    """Yield history records oldest first, across rotated files, one line at a time"""
+    hist_path = HISTORY_PATH
+    paths = [f"{hist_path}.{i}" for i in range(HISTORY_BACKUPS, 0, -1)] + [hist_path]
+    for path in paths:
+        try:
+            f = open(path, "r")
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Partially written or foreign line
+                    continue
+
+def format_record(record):
+    """One history line: start, exit, duration, peak RSS, command"""
+    import shlex
+
+    rss = record.get("peak_rss_kb")
+    rss_str = f"{rss / 1024:7.1f} MB" if rss else "      - MB"
+    command = " ".join([record.get("tool", "?")] + [shlex.quote(a) for a in record.get("args", [])])
+    return f"{record.get('start', '?'):<19}  exit {str(record.get('exit')):>4}  {record.get('duration', 0):8.2f}s  {rss_str}  {command}"
+
+def show_history(argv=None):
+    """Show execution history, filtered while streaming through the log"""
+    import argparse
+    import datetime
+    import heapq
+
+    parser = argparse.ArgumentParser(prog="runner.py --history", description="Query the tool run history")
+    parser.add_argument("--tool", help="Only runs of this tool")
+    parser.add_argument("--since", type=parse_since, help="Only runs started after this (30m, 2h, 7d or an ISO date)")
+    parser.add_argument("--failures", action="store_true", help="Only runs with a non-zero exit status")
+    parser.add_argument("--slowest", type=int, metavar="N", help="Only the N slowest matching runs")
+    parser.add_argument("--json", action="store_true", help="Print matching records as JSON lines")
+    args = parser.parse_args(argv)
+
+    def matches(record):
+        if args.tool and record.get("tool") != args.tool:
+            return False
+        if args.failures and record.get("exit") == 0:
+            return False
+        if args.since is not None:
+            try:
+                if datetime.datetime.fromisoformat(record["start"]).timestamp() < args.since:
+                    return False
+            except (KeyError, TypeError, ValueError):
+                return False
+        return True
+
+    records = (r for r in iter_history() if matches(r))
+    if args.slowest:
+        # Bounded memory: only the N slowest are kept while streaming
+        records = heapq.nlargest(args.slowest, records, key=lambda r: r.get("duration") or 0)
+
+    shown = 0
+    if not args.json:
+        print(f"--- Command History ({HISTORY_FILE}) ---")
+    for record in records:
+        print(json.dumps(record) if args.json else format_record(record))
+        shown += 1
+    if not shown and not args.json:
+        print("No matching history found.")
+
+# Tool modules already imported by this process (tool name -> module)
+_tool_modules = {}
+
+def load_tool(tool_name, script_path):
+    """Import a tool's script as a module (once per process)"""
+    import importlib.util
+
+    module = _tool_modules.get(tool_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(f"runner_tools.{tool_name}", script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _tool_modules[tool_name] = module
+    return module
+
+def exit_code(code):
+    """Map a SystemExit code to a process exit status, like the interpreter does"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    # sys.exit("message") prints the message and exits with 1
+    print(code, file=sys.stderr)
+    return 1
+
+def run_subprocess(script_path, args):
+    """Run the tool in a fresh interpreter (full isolation). Returns exit status."""
+    import subprocess
+
+    cmd = [sys.executable, script_path] + args
+    return subprocess.run(cmd).returncode
+
+def run_in_process(tool_name, script_path, args):
+    """
+    Run the tool's main() inside this interpreter with a patched sys.argv,
+    saving the second Python startup. Tools without a main() fall back to
+    a subprocess. Returns exit status.
+    """
+    tool_dir = os.path.dirname(script_path)
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    # Same view the tool gets when run as a script
+    sys.argv = [script_path] + args
+    sys.path.insert(0, tool_dir)
+    try:
+        module = load_tool(tool_name, script_path)
+        if not callable(getattr(module, "main", None)):
+            return run_subprocess(script_path, args)
+        module.main()
+        return 0
+    except SystemExit as e:
+        return exit_code(e.code)
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        sys.stdout.flush()
+
+def dispatch(tool_name, tool_args, isolate=False, mode=None):
+    """Find, run and log one tool invocation. Returns its exit status."""
+    # Find the tool script
+    # Expected structure: tools_dir/toolname/toolname.py
+    entry = get_tool(tool_name)
+
+    if entry is None:
+        print(f"Error: Tool '{tool_name}' not found.")
+        print(f"Expected path: {os.path.join(TOOLS_DIR, tool_name, f'{tool_name}.py')}")
+        list_tools()
+        return 1
+    script_path = tool_script(entry)
+
+    started = time.time()
+    start = time.monotonic()
+    try:
+        # Run the tool
+        if isolate or not entry["has_main"]:
+            status = run_subprocess(script_path, tool_args)
+        else:
+            status = run_in_process(tool_name, script_path, tool_args)
+    except KeyboardInterrupt:
+        print("\n[!] Execution interrupted.")
+        status = 130
+    except Exception as e:
+        import traceback
+        # In-process runs have no interpreter of their own to print this
+        traceback.print_exc()
+        print(f"[!] Error running tool: {e!r}", file=sys.stderr)
+        status = 1
+
+    # Log execution
+    log_command(tool_name, tool_args, started, time.monotonic() - start, status, peak_rss_kb(),
+                mode or ("subprocess" if isolate else "inprocess"))
+    return status
+
+# --- Daemon mode ---------------------------------------------------------
+
+DEFAULT_MAX_CONCURRENT = 8
+
+# Seconds a client gets to send its request after connecting
+REQUEST_TIMEOUT = 10
+
+def default_socket_path():
+    """
+    $RUNNER_SOCKET, else runner.sock in $XDG_RUNTIME_DIR, else in a private
+    (0700) per-user directory under /tmp (e.g. under cron)
+    """
+    if os.environ.get("RUNNER_SOCKET"):
+        return os.environ["RUNNER_SOCKET"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "runner.sock")
+    return os.path.join(f"/tmp/runner-{os.getuid()}", "runner.sock")
+
+def ensure_private_dir(path):
+    """
+    Create (0700) or verify the directory holding the socket.
+    Raises OSError if it belongs to someone else or others can access it.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError(f"{path} is not a private directory owned by uid {os.getuid()}")
+
+def peer_uid(sock):
+    """uid of the process at the other end of a unix socket (SO_PEERCRED)"""
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+def preload_tools():
+    """Import every tool once so forked runs start warm. Returns loaded names."""
+    loaded = []
+    for name in sorted(find_tools()):
+        script_path = tool_script(get_tool(name))
+        saved_argv, saved_path = sys.argv, list(sys.path)
+        sys.argv = [script_path]
+        sys.path.insert(0, os.path.dirname(script_path))
+        try:
+            load_tool(name, script_path)
+            loaded.append(name)
+        except (Exception, SystemExit) as e:
+            # e.g. a missing dependency; the tool reports it when called
+            print(f"[!] Could not preload {name}: {e}", file=sys.stderr)
+        finally:
+            sys.argv, sys.path[:] = saved_argv, saved_path
+    return loaded
+
+def serve_request(conn):
+    """
+    Handle one client in a forked child: adopt the client's stdio (passed as
+    file descriptors), cwd and environment, run the tool, report the exit status.
+    """
+    conn.settimeout(REQUEST_TIMEOUT)
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    if len(fds) != 3 or len(data) < 4:
         return
+    size = int.from_bytes(data[:4], "big")
+    body = data[4:]
+    while len(body) < size:
+        chunk = conn.recv(size - len(body))
+        if not chunk:
+            return
+        body += chunk
+    request = json.loads(body)
+    conn.settimeout(None)
+
+    # From here on the tool's output goes straight to the client's terminal
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # The daemon's own stdout may be a log file (block buffered): buffer the
+    # way the tool would if the client had run it directly
+    sys.stdout.reconfigure(line_buffering=os.isatty(1))
+    sys.stderr.reconfigure(line_buffering=True)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    conn.sendall(json.dumps({"pid": os.getpid()}).encode() + b"\n")
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        argv = request["argv"]
+        status = dispatch(argv[0], argv[1:], mode="daemon")
+    except Exception as e:
+        print(f"[!] Error running tool: {e}", file=sys.stderr)
+        status = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall(json.dumps({"exit": status}).encode() + b"\n")
+
+def reap_children(children, block=False):
+    """Collect finished runs; with block=True wait for at least one"""
+    while children:
+        try:
+            pid, _ = os.waitpid(-1, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            children.clear()
+            return
+        if pid == 0:
+            return
+        children.discard(pid)
+        block = False
+
+def serve_daemon(socket_path, max_concurrent=DEFAULT_MAX_CONCURRENT):
+    """
+    Preload all tools, then serve runs on a unix socket. Each run is forked
+    from the warm daemon, so runs are isolated from each other and from the
+    daemon. At most max_concurrent runs execute at once; further clients
+    wait in the listen backlog.
+    """
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if socket_path == default_socket_path() and socket_dir.startswith("/tmp/"):
+        try:
+            ensure_private_dir(socket_dir)
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"Error: A runner daemon is already listening on {socket_path}")
+            return 1
+        except OSError:
+            # Stale socket from a previous daemon
+            try:
+                os.unlink(socket_path)
+            except OSError as e:
+                print(f"Error: Could not remove stale socket {socket_path}: {e.strerror or e}")
+                return 1
+        finally:
+            probe.close()
+
+    loaded = preload_tools()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # socket usable by this user only
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(128)
+    # Wake up regularly to reap finished runs
+    server.settimeout(1.0)
+
+    print(f"[*] Runner daemon listening on {socket_path} "
+          f"({len(loaded)} tools preloaded, max {max_concurrent} concurrent runs)")
+    sys.stdout.flush()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Also stop cleanly on SIGTERM (and on SIGINT even when started in the background)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    children = set()
+    try:
+        while True:
+            reap_children(children, block=len(children) >= max_concurrent)
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            if peer_uid(conn) != os.getuid():
+                # Only runs from our own user get our tools and environment
+                conn.close()
+                continue
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                try:
+                    serve_request(conn)
+                except BaseException:
+                    os._exit(1)
+                os._exit(0)
+            conn.close()
+            children.add(pid)
+    except KeyboardInterrupt:
+        print("\n[*] Runner daemon stopped.")
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+def run_client(socket_path, argv):
+    """
+    Forward argv, cwd and environment to a runner daemon, handing it this
+    process's stdin/stdout/stderr. Ctrl+C is forwarded to the run.
+    Returns the tool's exit status.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        print(f"Error: No runner daemon at {socket_path} ({e}). Start one with: python runner.py --daemon")
+        return 1
+
+    # Our environment and terminal go to whoever listens there: make sure it's us
+    owner = peer_uid(sock)
+    if owner != os.getuid():
+        print(f"Error: {socket_path} is served by uid {owner}, not by you (uid {os.getuid()}). Refusing to connect.")
+        return 1
+
+    payload = json.dumps({"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}).encode()
+    message = len(payload).to_bytes(4, "big") + payload
+    sys.stdout.flush()
+    sent = socket.send_fds(sock, [message], [0, 1, 2])
+    sock.sendall(message[sent:])
+
+    run_pid = None
+
+    def forward_interrupt(signum, frame):
+        if run_pid:
+            os.kill(run_pid, signal.SIGINT)
+
+    signal.signal(signal.SIGINT, forward_interrupt)
+    for line in sock.makefile("rb"):
+        reply = json.loads(line)
+        if "pid" in reply:
+            run_pid = reply["pid"]
+        if "exit" in reply:
+            return reply["exit"]
+
+    print("Error: Runner daemon closed the connection before the tool finished.", file=sys.stderr)
+    return 1
+
+# --- Batch mode ----------------------------------------------------------
+
+DEFAULT_BATCH_WORKERS = 4
+
+# stderr lines kept per run in the batch report
+STDERR_TAIL_LINES = 20
+
+def load_plan(plan_path):
+    """
+    Read a batch plan (YAML, or JSON which YAML also accepts).
+    Returns (runs, settings); raises ValueError for an invalid plan.
+    """
+    import shlex
+
+    with open(plan_path, "r") as f:
+        text = f.read()
+    try:
+        import yaml
+        data = yaml.safe_load(text)
+    except ImportError:
+        # JSON plans work without PyYAML
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise ValueError("YAML plans need PyYAML: pip install pyyaml (or write the plan as JSON)")
+    except yaml.YAMLError as e:
+        raise ValueError(f"Could not parse plan: {e}")
+
+    if not isinstance(data, dict) or not isinstance(data.get("runs"), list) or not data["runs"]:
+        raise ValueError("Plan needs a non-empty 'runs' list")
+
+    runs = []
+    for index, entry in enumerate(data["runs"], 1):
+        if isinstance(entry, str):
+            entry = {"tool": entry}
+        if not isinstance(entry, dict) or not entry.get("tool"):
+            raise ValueError(f"Run #{index} needs a 'tool'")
+        args = entry.get("args") or []
+        args = shlex.split(args) if isinstance(args, str) else [str(a) for a in args]
+        runs.append({
+            "name": str(entry.get("name") or entry["tool"]),
+            "tool": str(entry["tool"]),
+            "args": args,
+            "json": entry.get("json", "auto"),
+            "timeout": entry.get("timeout", data.get("timeout")),
+        })
+
+    names = [run["name"] for run in runs]
+    dupes = sorted({n for n in names if names.count(n) > 1})
+    if dupes:
+        raise ValueError(f"Duplicate run name(s): {', '.join(dupes)} (set 'name' to tell them apart)")
+    return runs, {"workers": data.get("workers", DEFAULT_BATCH_WORKERS)}
 
-    print(f"--- Command History ({HISTORY_FILE}) ---")
-    with open(hist_path, "r") as f:
-        print(f.read())
+def parse_tool_output(stdout):
+    """
+    A JSON document, a list for NDJSON output, or None if it isn't JSON.
+    Progress lines printed before the JSON (e.g. '[*] Checking...') are skipped.
+    """
+    lines = stdout.splitlines()
+    for i, line in enumerate(lines):
+        if not line.lstrip().startswith(("{", "[")):
+            continue
+        try:
+            return json.loads("\n".join(lines[i:]))
+        except ValueError:
+            pass
+        try:
+            return [json.loads(record) for record in lines[i:] if record.strip()]
+        except ValueError:
+            # e.g. a '[*] Checking...' banner; try from the next line
+            continue
+    return None
+
+def execute_batch_run(run):
+    """Run one plan entry in its own interpreter and capture its output"""
+    import subprocess
+    import threading
+
+    entry = get_tool(run["tool"])
+    result = {"name": run["name"], "tool": run["tool"], "args": run["args"],
+              "exit_code": None, "duration": 0.0}
+    if entry is None:
+        result["error"] = f"Tool '{run['tool']}' not found"
+        return result
+    script_path = tool_script(entry)
+
+    args = list(run["args"])
+    want_json = run["json"] is True or (run["json"] == "auto" and entry["supports_json"])
+    if want_json and "--json" not in args:
+        args.append("--json")
+    result["args"] = args
+
+    started = time.time()
+    start = time.monotonic()
+    # Own process group, so a timeout also kills whatever the tool started
+    proc = subprocess.Popen([sys.executable, script_path] + args, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True, errors="replace",
+                            start_new_session=True)
+    captured = {}
+
+    def drain(name, stream):
+        captured[name] = stream.read()
+
+    readers = [threading.Thread(target=drain, args=item) for item in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for reader in readers:
+        reader.start()
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    timer = threading.Timer(run["timeout"], expire) if run["timeout"] else None
+    if timer:
+        timer.start()
+    # wait4 instead of wait() so the run's own peak RSS is known
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if timer:
+        timer.cancel()
+    for reader in readers:
+        reader.join()
+    proc.stdout.close()
+    proc.stderr.close()
+
+    result["duration"] = round(time.monotonic() - start, 3)
+    result["peak_rss_kb"] = usage.ru_maxrss
+    log_command(run["tool"], args, started, result["duration"], proc.returncode, usage.ru_maxrss, "batch")
+    if timed_out.is_set():
+        result["error"] = f"Timed out after {run['timeout']}s"
+        return result
+    result["exit_code"] = proc.returncode
+
+    output = parse_tool_output(captured["stdout"]) if want_json else None
+    if output is not None:
+        result["output"] = output
+    else:
+        result["stdout"] = captured["stdout"]
+    stderr = captured["stderr"].strip().splitlines()[-STDERR_TAIL_LINES:]
+    if stderr:
+        result["stderr"] = "\n".join(stderr)
+    return result
+
+def run_batch(plan_path, workers=None, output_path=None):
+    """
+    Run every tool in a plan concurrently (bounded by workers) and write one
+    merged JSON report to stdout or output_path. Progress goes to stderr.
+    Returns 0 if every run exited 0, else 1.
+    """
+    import datetime
+    from concurrent.futures import ThreadPoolExecutor
+
+    try:
+        runs, settings = load_plan(plan_path)
+        workers = max(1, int(workers or settings["workers"]))
+    except OSError as e:
+        print(f"Error: Could not read plan {plan_path}: {e}")
+        return 1
+    except (TypeError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    # Load the registry once before the workers share it
+    load_registry()
+    print(f"[*] Running {len(runs)} tool(s) from {plan_path} with {workers} worker(s)...", file=sys.stderr)
+    started = datetime.datetime.now().isoformat(timespec="seconds")
+    start = time.monotonic()
+
+    def execute(run):
+        result = execute_batch_run(run)
+        status = result.get("error") or f"exit {result['exit_code']}"
+        print(f"    [{'+' if result['exit_code'] == 0 else '!'}] {result['name']}: {status} "
+              f"({result['duration']:.2f}s)", file=sys.stderr)
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(execute, runs))
+
+    failed = [r["name"] for r in results if r["exit_code"] != 0]
+    report = {
+        "plan": plan_path,
+        "started": started,
+        "duration": round(time.monotonic() - start, 3),
+        "ok": not failed,
+        "failed": failed,
+        "results": results,
+    }
+
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"[*] Report written to {output_path}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    print(f"[*] {len(runs) - len(failed)}/{len(runs)} succeeded in {report['duration']:.2f}s", file=sys.stderr)
+    return 0 if not failed else 1
+
+def parse_runner_options(argv):
+    """
+    Split leading runner options from '<tool_name> [args...]'.
+    Returns (options, remaining args); raises ValueError on bad usage.
+    """
+    options = {"isolate": False, "daemon": False, "client": False, "socket": None,
+               "max_concurrent": DEFAULT_MAX_CONCURRENT, "batch": None, "workers": None, "output": None}
+    valued = ("--socket", "--max-concurrent", "--batch", "--workers", "--output")
+    i = 0
+    while i < len(argv) and argv[i] in ("--isolate", "--daemon", "--client") + valued:
+        flag = argv[i]
+        if flag in valued:
+            if i + 1 >= len(argv):
+                raise ValueError(f"{flag} needs a value")
+            value = argv[i + 1]
+            key = flag[2:].replace("-", "_")
+            if flag in ("--max-concurrent", "--workers"):
+                try:
+                    value = max(1, int(value))
+                except ValueError:
+                    raise ValueError(f"{flag} expects a number, got '{value}'")
+            options[key] = value
+            i += 2
+            continue
+        options[flag[2:]] = True
+        i += 1
+    if options["socket"] is None:
+        options["socket"] = default_socket_path()
+    return options, argv[i:]
 
 def main():
     if len(sys.argv) < 2:
         print("Usage: python runner.py <tool_name> [args...]")
         print("       python runner.py --list      (List tools)")
-        print("       python runner.py --history   (Show history)")
+        print("       python runner.py --history [--tool T] [--since 2h] [--failures] [--slowest N] [--json]   (Show history)")
+        print("       python runner.py --isolate <tool_name> [args...]   (Run tool in a separate interpreter)")
+        print("       python runner.py --daemon [--socket PATH] [--max-concurrent N]   (Serve warm tool runs)")
+        print("       python runner.py --client [--socket PATH] <tool_name> [args...]   (Run via the daemon)")
+        print("       python runner.py --batch plan.yaml [--workers N] [--output report.json]   (Run tools concurrently)")
         sys.exit(1)
 
-    tool_name = sys.argv[1]
-    tool_args = sys.argv[2:]
-
-    if tool_name == "--list":
+    if sys.argv[1] == "--list":
         list_tools()
         sys.exit(0)
     
-    if tool_name == "--history":
-        show_history()
+    if sys.argv[1] == "--history":
+        show_history(sys.argv[2:])
         sys.exit(0)
 
-    # Find the tool script
-    # Expected structure: tools_dir/toolname/toolname.py
-    script_path = os.path.join(TOOLS_DIR, tool_name, f"{tool_name}.py")
-    
-    if not os.path.exists(script_path):
-        print(f"Error: Tool '{tool_name}' not found.")
-        print(f"Expected path: {script_path}")
-        list_tools()
+    try:
+        options, runner_args = parse_runner_options(sys.argv[1:])
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
-    # Log execution
-    log_command(tool_name, tool_args)
+    if options["batch"]:
+        sys.exit(run_batch(options["batch"], options["workers"], options["output"]))
 
-    # Construct python command
-    cmd = [sys.executable, script_path] + tool_args
-    
-    try:
-        # Run the tool
-        subprocess.run(cmd)
-    except KeyboardInterrupt:
-        print("\n[!] Execution interrupted.")
-    except Exception as e:
-        print(f"[!] Error running tool: {e}")
+    if options["daemon"]:
+        if runner_args:
+            print(f"Error: --daemon does not take a tool name (got '{runner_args[0]}')")
+            sys.exit(1)
+        sys.exit(serve_daemon(options["socket"], options["max_concurrent"]))
+
+    if not runner_args:
+        print("Error: No tool name given.")
+        sys.exit(1)
+
+    if options["client"]:
+        sys.exit(run_client(options["socket"], runner_args))
+
+    sys.exit(dispatch(runner_args[0], runner_args[1:], isolate=options["isolate"]))
 
 if __name__ == "__main__":
     main()
@@ -2,8 +2,17 @@ import argparse
 import ssl
 import socket
 import sys
+import json
+import asyncio
+import os
+import re
+import hashlib
+import ipaddress
+import time
 from datetime import datetime
 
+EXPIRY_FORMAT = r'%b %d %H:%M:%S %Y %Z'
+
 def check_ssl_expiry(host, port=443):
     context = ssl.create_default_context()
     conn = context.wrap_socket(
@@ -21,7 +30,7 @@ def check_ssl_expiry(host, port=443):
         # Parse expiry date
         # Format: 'May 20 12:00:00 2025 GMT'
         expire_str = ssl_info['notAfter']
-        expire_date = datetime.strptime(expire_str, r'%b %d %H:%M:%S %Y %Z')
+        expire_date = datetime.strptime(expire_str, EXPIRY_FORMAT)
         
         return expire_date
     except Exception as e:
@@ -30,14 +39,485 @@ def check_ssl_expiry(host, port=443):
     finally:
         conn.close()
 
+# --- Minimal DER / X.509 decoding (stdlib only) ---
+
+OID_COMMON_NAME = bytes.fromhex("550403")
+OID_SUBJECT_ALT_NAME = bytes.fromhex("551d11")
+
+KEY_ALGORITHMS = {
+    bytes.fromhex("2a864886f70d010101"): "RSA",
+    bytes.fromhex("2a8648ce3d0201"): "EC",
+    bytes.fromhex("2a8648ce380401"): "DSA",
+    bytes.fromhex("2b6570"): "Ed25519",
+    bytes.fromhex("2b6571"): "Ed448",
+}
+
+EC_CURVES = {
+    bytes.fromhex("2a8648ce3d030107"): ("P-256", 256),
+    bytes.fromhex("2b81040022"): ("P-384", 384),
+    bytes.fromhex("2b81040023"): ("P-521", 521),
+}
+
+def der_read(data, pos):
+    """
+    Read one TLV at pos. Returns (tag, content_start, content_end).
+    """
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7f
+        length = int.from_bytes(data[pos:pos + n], "big")
+        pos += n
+    return tag, pos, pos + length
+
+def der_children(data, start, end):
+    """List the (tag, start, end) TLVs inside a constructed value"""
+    children = []
+    pos = start
+    while pos < end:
+        tag, cstart, cend = der_read(data, pos)
+        children.append((tag, cstart, cend))
+        pos = cend
+    return children
+
+def der_time(tag, raw):
+    text = raw.decode("ascii").rstrip("Z")
+    if tag == 0x17:  # UTCTime, two-digit year
+        year = int(text[:2])
+        text = ("19" if year >= 50 else "20") + text
+    return datetime.strptime(text[:14], "%Y%m%d%H%M%S")
+
+def der_common_name(data, start, end):
+    """Pull the CN out of an X.501 Name"""
+    for _, set_start, set_end in der_children(data, start, end):
+        for _, atv_start, atv_end in der_children(data, set_start, set_end):
+            (_, oid_s, oid_e), (_, val_s, val_e) = der_children(data, atv_start, atv_end)[:2]
+            if data[oid_s:oid_e] == OID_COMMON_NAME:
+                return data[val_s:val_e].decode("utf-8", errors="replace")
+    return ""
+
+def parse_certificate(der):
+    """
+    Decode the fields sslcheck reports from a DER certificate:
+    subject/issuer CN, validity, SANs and public key type/size.
+    """
+    _, cert_s, cert_e = der_read(der, 0)
+    _, tbs_s, tbs_e = der_children(der, cert_s, cert_e)[0]
+    fields = der_children(der, tbs_s, tbs_e)
+    if fields[0][0] == 0xa0:  # explicit version
+        fields = fields[1:]
+    _, _, issuer, validity, subject, spki = fields[:6]
+    extensions = [f for f in fields[6:] if f[0] == 0xa3]
+
+    not_before, not_after = [der_time(t, der[a:b]) for t, a, b in der_children(der, validity[1], validity[2])]
+
+    (_, alg_s, alg_e), (_, key_s, key_e) = der_children(der, spki[1], spki[2])
+    alg = der_children(der, alg_s, alg_e)
+    key_type = KEY_ALGORITHMS.get(der[alg[0][1]:alg[0][2]], "unknown")
+    key_bits = None
+    if key_type == "RSA":
+        # BIT STRING: one unused-bits byte, then SEQUENCE { modulus, exponent }
+        _, seq_s, seq_e = der_read(der, key_s + 1)
+        _, mod_s, mod_e = der_children(der, seq_s, seq_e)[0]
+        key_bits = int.from_bytes(der[mod_s:mod_e], "big").bit_length()
+    elif key_type == "EC" and len(alg) > 1:
+        curve, key_bits = EC_CURVES.get(der[alg[1][1]:alg[1][2]], ("unknown", None))
+        key_type = f"EC {curve}"
+    elif key_type == "Ed25519":
+        key_bits = 256
+    elif key_type == "Ed448":
+        key_bits = 456
+
+    san = []
+    for _, ext_s, ext_e in extensions:
+        _, seq_s, seq_e = der_read(der, ext_s)
+        for _, e_s, e_e in der_children(der, seq_s, seq_e):
+            parts = der_children(der, e_s, e_e)
+            if der[parts[0][1]:parts[0][2]] != OID_SUBJECT_ALT_NAME:
+                continue
+            _, oct_s, oct_e = parts[-1]
+            _, names_s, names_e = der_read(der, oct_s)
+            for tag, n_s, n_e in der_children(der, names_s, names_e):
+                if tag == 0x82:
+                    san.append(der[n_s:n_e].decode("ascii", errors="replace"))
+                elif tag == 0x87:
+                    san.append(str(ipaddress.ip_address(der[n_s:n_e])))
+
+    return {
+        "subject": der_common_name(der, subject[1], subject[2]),
+        "issuer": der_common_name(der, issuer[1], issuer[2]),
+        "not_before": not_before.isoformat(),
+        "not_after": not_after.isoformat(),
+        "key_type": key_type,
+        "key_bits": key_bits,
+        "san": san,
+    }
+
+def hostname_matches(hostname, names):
+    """RFC 6125 style match of hostname against SAN entries (single-label wildcards)"""
+    hostname = hostname.lower().rstrip(".")
+    for name in names:
+        name = name.lower().rstrip(".")
+        if name == hostname:
+            return True
+        if name.startswith("*.") and "." in hostname:
+            if hostname.split(".", 1)[1] == name[2:]:
+                return True
+    return False
+
+PEM_BLOCK_RE = re.compile(rb"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", re.S)
+
+def load_cert_file(path):
+    """Read a .pem/.crt file (PEM bundle or single DER cert) into a list of DER blobs"""
+    with open(path, "rb") as f:
+        data = f.read()
+    blocks = PEM_BLOCK_RE.findall(data)
+    if blocks:
+        return [ssl.PEM_cert_to_DER_cert(b.decode("ascii")) for b in blocks]
+    return [data]
+
+def is_cert_file(entry):
+    return entry.lower().endswith((".pem", ".crt", ".cer", ".der")) and os.path.isfile(entry)
+
+def describe_chain(ders, hostname=None):
+    """
+    Summarize a leaf-first chain: per-cert details, earliest expiry across the
+    chain and whether the leaf SANs cover hostname.
+    """
+    chain = [parse_certificate(der) for der in ders]
+    leaf = chain[0]
+    result = {
+        "not_after": leaf["not_after"],
+        "chain_not_after": min(c["not_after"] for c in chain),
+        "chain": chain,
+    }
+    if hostname:
+        result["san_match"] = hostname_matches(hostname, leaf["san"] or [leaf["subject"]])
+    return result
+
+def peer_chain(ssl_obj):
+    """DER chain (leaf first) from an SSLSocket or SSLObject"""
+    getter = getattr(ssl_obj, "get_verified_chain", None)  # Python 3.13+
+    if getter:
+        chain = getter()
+        if chain:
+            return [bytes(c) for c in chain]
+    inner = getattr(ssl_obj, "_sslobj", None)
+    if inner is not None and hasattr(inner, "get_verified_chain"):
+        chain = inner.get_verified_chain()
+        if chain:
+            return [c.public_bytes(ssl._ssl.ENCODING_DER) for c in chain]
+    # No access to the verified chain on this Python: only the leaf is available
+    return [ssl_obj.getpeercert(binary_form=True)]
+
+def connection_details(ssl_obj, hostname, ders=None):
+    """Chain, protocol and cipher for an established TLS connection"""
+    details = describe_chain(ders or peer_chain(ssl_obj), hostname)
+    cipher, _, bits = ssl_obj.cipher()
+    details.update(protocol=ssl_obj.version(), cipher=cipher, cipher_bits=bits)
+    return details
+
+def inspect_endpoint(host, port=443, timeout=5.0, context=None):
+    """Full TLS inspection of host:port (blocking)"""
+    context = context or ssl.create_default_context()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        with context.wrap_socket(sock, server_hostname=host) as conn:
+            return connection_details(conn, host)
+
+def inspect_file(path, hostname=None):
+    """Offline inspection of a local certificate (or bundle)"""
+    return describe_chain(load_cert_file(path), hostname)
+
+# --- On-disk result cache ---
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "sslcheck")
+
+def cache_path(host, port):
+    key = hashlib.sha256(f"{host}:{port}".encode()).hexdigest()[:32]
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def load_cached(host, port, ttl):
+    """Cached details for host:port if younger than ttl seconds, else None"""
+    if ttl <= 0:
+        return None
+    try:
+        with open(cache_path(host, port), "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("host") != host or entry.get("port") != port or time.time() - entry.get("checked_at", 0) > ttl:
+        return None
+    return entry["details"]
+
+def store_cached(host, port, details):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = cache_path(host, port) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"host": host, "port": port, "checked_at": time.time(), "details": details}, f)
+        os.replace(tmp, cache_path(host, port))
+    except OSError:
+        pass
+
+def parse_target(entry, default_port=443):
+    """
+    Parse 'host', 'host:port' or '[v6addr]:port' into (host, port).
+    Raises ValueError for a malformed port.
+    """
+    if entry.startswith('['):
+        host, _, rest = entry[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else default_port
+    elif entry.count(':') == 1:
+        host, port = entry.split(':')
+    else:
+        host, port = entry, default_port
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"invalid port '{port}'")
+    if not 0 < port < 65536:
+        raise ValueError(f"port {port} out of range")
+    return host, port
+
+def read_targets(source, default_port=443):
+    """
+    Read host[:port] lines; blank lines and '#' comments are ignored.
+    Returns (targets, invalid) where invalid holds (line number, entry, reason)
+    for lines that could not be parsed.
+    """
+    targets = []
+    invalid = []
+    for lineno, line in enumerate(source, 1):
+        entry = line.split('#', 1)[0].strip()
+        if not entry:
+            continue
+        if is_cert_file(entry):
+            targets.append((entry, None))
+            continue
+        try:
+            targets.append(parse_target(entry, default_port))
+        except ValueError as e:
+            invalid.append((lineno, entry, str(e)))
+    return targets, invalid
+
+async def fetch_details_async(host, port, context, timeout):
+    """
+    Handshake with host:port and return connection_details() for it.
+    """
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port, ssl=context, server_hostname=host), timeout)
+    try:
+        return connection_details(writer.get_extra_info('ssl_object'), host)
+    finally:
+        writer.close()
+
+def classify(days_left, warn_days):
+    if days_left < 0:
+        return "EXPIRED"
+    if days_left < warn_days:
+        return "WARN"
+    return "OK"
+
+async def check_many(targets, warn_days=14, timeout=5.0, concurrency=200, chain=False, cache_ttl=0):
+    """
+    Check all targets concurrently (at most `concurrency` handshakes in flight),
+    each bounded by `timeout`. Targets that are local certificate files are read
+    offline; results younger than cache_ttl are served from the disk cache.
+    An endpoint listed more than once is only contacted once.
+    Returns list of result dicts.
+    """
+    context = ssl.create_default_context()
+    semaphore = asyncio.Semaphore(concurrency)
+    now = datetime.utcnow()
+    inflight = {}
+
+    async def fetch(host, port):
+        details = load_cached(host, port, cache_ttl)
+        if details is None:
+            async with semaphore:
+                details = await fetch_details_async(host, port, context, timeout)
+            if cache_ttl > 0:
+                store_cached(host, port, details)
+        return details
+
+    async def get_details(host, port):
+        if is_cert_file(host):
+            return inspect_file(host)
+        if (host, port) not in inflight:
+            inflight[(host, port)] = asyncio.ensure_future(fetch(host, port))
+        return await inflight[(host, port)]
+
+    async def one(host, port):
+        result = {"host": host, "port": port, "expires": None, "days_left": None, "status": "ERROR", "error": None}
+        try:
+            details = await get_details(host, port)
+        except asyncio.TimeoutError:
+            result["error"] = f"timeout after {timeout}s"
+            return result
+        except (OSError, ssl.SSLError, ValueError, KeyError, IndexError) as e:
+            result["error"] = str(e) or e.__class__.__name__
+            return result
+        expiry = datetime.fromisoformat(details["chain_not_after" if chain else "not_after"])
+        days_left = (expiry - now).days
+        result.update(expires=expiry.isoformat(), days_left=days_left, status=classify(days_left, warn_days), details=details)
+        return result
+
+    return await asyncio.gather(*(one(host, port) for host, port in targets))
+
+def sort_results(results):
+    """Errors first, then soonest expiry"""
+    return sorted(results, key=lambda r: (r["status"] != "ERROR", r["days_left"] if r["days_left"] is not None else 0, r["host"]))
+
+def print_results(results):
+    print(f"{'STATUS':<8} {'DAYS':>6}  {'TARGET':<40} {'EXPIRES / ERROR'}")
+    print("-" * 90)
+    for r in results:
+        days = r["days_left"] if r["days_left"] is not None else "-"
+        target = f"{r['host']}:{r['port']}" if r['port'] else r['host']
+        print(f"{r['status']:<8} {days:>6}  {target:<40} {r['expires'] or r['error']}")
+
+def bulk_exit_code(counts):
+    """
+    0 = all OK, 1 = something expires soon, 2 = expired or unreachable.
+    """
+    if counts["EXPIRED"] or counts["ERROR"]:
+        return 2
+    if counts["WARN"]:
+        return 1
+    return 0
+
+def run_bulk(args):
+    try:
+        if args.file == '-':
+            targets, invalid = read_targets(sys.stdin, args.port)
+        else:
+            with open(args.file, 'r') as f:
+                targets, invalid = read_targets(f, args.port)
+    except OSError as e:
+        print(f"Error: Could not read {args.file}: {e.strerror or e}")
+        sys.exit(2)
+
+    if not args.json:
+        print(f"[*] Checking {len(targets)} endpoints (concurrency {args.concurrency}, timeout {args.timeout}s)...\n")
+
+    results = asyncio.run(check_many(
+        targets, args.days, args.timeout, args.concurrency, chain=args.chain, cache_ttl=args.cache_ttl))
+    # A typo in the inventory fails that entry, not the whole run
+    source = "stdin" if args.file == '-' else args.file
+    for lineno, entry, reason in invalid:
+        results.append({"host": entry, "port": None, "expires": None, "days_left": None,
+                        "status": "ERROR", "error": f"{source} line {lineno}: {reason}"})
+    results = sort_results(results)
+    counts = {"OK": 0, "WARN": 0, "EXPIRED": 0, "ERROR": 0}
+    for r in results:
+        counts[r["status"]] += 1
+
+    if args.json:
+        print(json.dumps({"results": results, "summary": counts}, indent=4))
+    else:
+        print_results(results)
+        print(f"\n[*] {counts['OK']} OK, {counts['WARN']} expiring within {args.days} days, "
+              f"{counts['EXPIRED']} expired, {counts['ERROR']} errors.")
+    sys.exit(bulk_exit_code(counts))
+
+def print_details(target, details, now):
+    leaf = details["chain"][0]
+    print(f"\nTarget: {target}")
+    print(f"Subject: {leaf['subject']}  (issuer: {leaf['issuer']})")
+    print(f"Key: {leaf['key_type']} {leaf['key_bits'] or ''}".rstrip())
+    if leaf["san"]:
+        print(f"SAN: {', '.join(leaf['san'])}")
+    if "san_match" in details:
+        print(f"Hostname covered by SAN: {'yes' if details['san_match'] else 'NO'}")
+    if details.get("protocol"):
+        print(f"Protocol: {details['protocol']}  Cipher: {details['cipher']} ({details['cipher_bits']} bits)")
+    print("Chain:")
+    for n, cert in enumerate(details["chain"]):
+        days = (datetime.fromisoformat(cert["not_after"]) - now).days
+        print(f"  [{n}] {cert['subject']:<40} expires {cert['not_after']} ({days} days)  {cert['key_type']} {cert['key_bits'] or ''}")
+
+def run_detailed(args):
+    """
+    Single target with full chain details: a local certificate file, or a
+    live endpoint (optionally served from the disk cache).
+    """
+    # Progress lines would break --json output
+    status_out = sys.stderr if args.json else sys.stdout
+    if is_cert_file(args.domain):
+        print(f"[*] Reading certificate file {args.domain}...", file=status_out)
+        target = args.domain
+        try:
+            details = inspect_file(args.domain, args.hostname)
+        except OSError as e:
+            print(f"[!] Could not read {args.domain}: {e.strerror or e}")
+            sys.exit(1)
+        except (ValueError, IndexError) as e:
+            print(f"[!] Could not parse certificate in {args.domain}: {e or e.__class__.__name__}")
+            sys.exit(1)
+    else:
+        print(f"[*] Inspecting TLS for {args.domain}:{args.port}...", file=status_out)
+        target = f"{args.domain}:{args.port}"
+        details = load_cached(args.domain, args.port, args.cache_ttl)
+        if details is not None:
+            print("[*] Using cached result.", file=status_out)
+        else:
+            try:
+                details = inspect_endpoint(args.domain, args.port, args.timeout)
+            except (OSError, ssl.SSLError) as e:
+                print(f"[!] Error connecting to {args.domain}: {e}")
+                sys.exit(1)
+            except (ValueError, IndexError) as e:
+                print(f"[!] Could not parse the certificate from {args.domain}: {e or e.__class__.__name__}")
+                sys.exit(1)
+            if args.cache_ttl > 0:
+                store_cached(args.domain, args.port, details)
+
+    now = datetime.utcnow()
+    expiry = datetime.fromisoformat(details["chain_not_after" if args.chain else "not_after"])
+    days_left = (expiry - now).days
+
+    if args.json:
+        print(json.dumps({"target": target, "expires": expiry.isoformat(), "days_left": days_left,
+                          "status": classify(days_left, args.days), "details": details}, indent=4))
+    else:
+        print_details(target, details, now)
+        print(f"\nExpires On: {expiry} ({'earliest in chain' if args.chain else 'leaf'})")
+        print(f"Time Left: {days_left} days")
+
+    status = classify(days_left, args.days)
+    if not args.json:
+        if status == "EXPIRED":
+            print(f"\n[!!!] CERTIFICATE EXPIRED {abs(days_left)} DAYS AGO [!!!]")
+        elif status == "WARN":
+            print(f"\n[!] WARNING: Certificate expires soon (< {args.days} days)!")
+        else:
+            print(f"\n[OK] Certificate is valid.")
+    sys.exit(0 if status == "OK" else 1)
+
 def main():
     parser = argparse.ArgumentParser(description="SSLCheck: SSL Certificate Expiry Monitor")
-    parser.add_argument("domain", help="Domain to check (e.g., google.com)")
+    parser.add_argument("domain", nargs="?", help="Domain to check (e.g., google.com) or a local .pem/.crt file")
     parser.add_argument("--port", type=int, default=443, help="Port (default: 443)")
     parser.add_argument("--days", type=int, default=14, help="Warning threshold in days (default: 14)")
     parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--file", help="Check every host[:port] listed in FILE ('-' for stdin)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-endpoint timeout in seconds (default: 5)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Max simultaneous handshakes with --file (default: 200)")
+    parser.add_argument("--chain", action="store_true", help="Inspect the full chain and use its earliest expiry")
+    parser.add_argument("--cache-ttl", type=float, default=0, help="Reuse results cached on disk for N seconds (default: 0, off)")
+    parser.add_argument("--hostname", help="Hostname to verify SAN coverage for local certificate files")
     
     args = parser.parse_args()
+
+    if args.file:
+        run_bulk(args)
+
+    if not args.domain:
+        parser.error("a domain or --file is required")
+
+    if args.chain or args.cache_ttl > 0 or is_cert_file(args.domain):
+        run_detailed(args)
     
     print(f"[*] Checking SSL for {args.domain}:{args.port}...")
     
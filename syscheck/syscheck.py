@@ -2,6 +2,7 @@ import argparse
 import sys
 import json
 import time
+import threading
 from datetime import datetime
 import platform
 
@@ -28,7 +29,8 @@ def get_size(bytes, suffix="B"):
 
 def check_cpu(args):
     """Monitor CPU usage"""
-    print(f"[*] Checking CPU Usage... (Interval: {args.interval}s)")
+    if not args.json:
+        print(f"[*] Checking CPU Usage... (Interval: {args.interval}s)")
     # First call to cpu_percent with interval returns the usage
     usage = psutil.cpu_percent(interval=args.interval, percpu=True)
     total_usage = psutil.cpu_percent(interval=None)
@@ -54,7 +56,8 @@ def check_cpu(args):
 
 def check_memory(args):
     """Monitor Memory usage"""
-    print("[*] Checking Memory Usage...")
+    if not args.json:
+        print("[*] Checking Memory Usage...")
     svmem = psutil.virtual_memory()
     swap = psutil.swap_memory()
     
@@ -81,27 +84,111 @@ def check_memory(args):
         
     return data
 
+# Mount metadata cached between --watch iterations
+_mount_cache = {"expires": 0.0, "partitions": []}
+
+# statvfs probes that never returned; keyed by mountpoint so a wedged
+# filesystem is not probed again (and another thread leaked) each iteration
+_stalled_probes = {}
+
+def get_partitions(cache_ttl=0):
+    """List mounted partitions, optionally reusing a cached list for cache_ttl seconds"""
+    now = time.monotonic()
+    if cache_ttl > 0 and now < _mount_cache["expires"]:
+        return _mount_cache["partitions"]
+
+    partitions = psutil.disk_partitions()
+    if cache_ttl > 0:
+        _mount_cache["partitions"] = partitions
+        _mount_cache["expires"] = now + cache_ttl
+    return partitions
+
+def _probe_worker(mountpoint, results):
+    try:
+        results[mountpoint] = psutil.disk_usage(mountpoint)
+    except OSError as e:
+        results[mountpoint] = e
+
+def probe_disk_usage(mountpoints, timeout=2.0):
+    """
+    Run disk_usage (statvfs) for every mountpoint concurrently.
+    Returns dict: mountpoint -> usage, OSError, or None if the probe
+    did not finish before the deadline (stalled mount).
+    """
+    results = {}
+    threads = {}
+
+    for mountpoint in mountpoints:
+        pending = _stalled_probes.get(mountpoint)
+        if pending is not None:
+            if pending.is_alive():
+                # Still wedged from a previous iteration
+                continue
+            del _stalled_probes[mountpoint]
+
+        # Daemon threads: a probe stuck in the kernel must not block interpreter exit
+        t = threading.Thread(target=_probe_worker, args=(mountpoint, results), daemon=True)
+        t.start()
+        threads[mountpoint] = t
+
+    deadline = time.monotonic() + timeout
+    for mountpoint, t in threads.items():
+        t.join(max(0.0, deadline - time.monotonic()))
+        if t.is_alive():
+            _stalled_probes[mountpoint] = t
+
+    return {mp: results.get(mp) for mp in mountpoints}
+
 def check_disk(args):
     """Monitor Disk usage"""
-    print("[*] Checking Disk Usage...")
-    partitions = psutil.disk_partitions()
+    if not args.json:
+        print("[*] Checking Disk Usage...")
+    cache_ttl = args.mount_cache if args.watch else 0
+    partitions = get_partitions(cache_ttl=cache_ttl)
+    usage = probe_disk_usage([p.mountpoint for p in partitions], timeout=args.disk_timeout)
     disk_data = []
     
     for partition in partitions:
-        try:
-            partition_usage = psutil.disk_usage(partition.mountpoint)
-        except PermissionError:
+        partition_usage = usage.get(partition.mountpoint)
+        if isinstance(partition_usage, PermissionError):
             continue
-            
+
         p_data = {
             "device": partition.device,
             "mountpoint": partition.mountpoint,
             "fstype": partition.fstype,
+        }
+
+        if isinstance(partition_usage, OSError):
+            # e.g. ESTALE/EIO: a broken mount is worth reporting, not hiding
+            p_data.update({"status": "error", "errno": partition_usage.errno,
+                           "error": partition_usage.strerror or str(partition_usage),
+                           "total": None, "used": None, "free": None, "percent": None})
+            disk_data.append(p_data)
+            if not args.json:
+                print(f"Device: {p_data['device']}")
+                print(f"  Mount: {p_data['mountpoint']}")
+                print(f"  Type: {p_data['fstype']}")
+                print(f"  [ERROR] {p_data['error']} (errno {p_data['errno']})")
+            continue
+
+        if partition_usage is None:
+            p_data.update({"status": "stalled", "total": None, "used": None, "free": None, "percent": None})
+            disk_data.append(p_data)
+            if not args.json:
+                print(f"Device: {p_data['device']}")
+                print(f"  Mount: {p_data['mountpoint']}")
+                print(f"  Type: {p_data['fstype']}")
+                print(f"  [STALLED] No response within {args.disk_timeout}s (hung mount?)")
+            continue
+
+        p_data.update({
+            "status": "ok",
             "total": get_size(partition_usage.total),
             "used": get_size(partition_usage.used),
             "free": get_size(partition_usage.free),
             "percent": partition_usage.percent
-        }
+        })
         disk_data.append(p_data)
         
         if not args.json:
@@ -117,7 +204,8 @@ def check_disk(args):
 
 def check_processes(args):
     """List top consuming processes"""
-    print(f"[*] Listing Top {args.top} Processes by Memory...")
+    if not args.json:
+        print(f"[*] Listing Top {args.top} Processes by Memory...")
     processes = []
     for proc in psutil.process_iter(['pid', 'name', 'username', 'memory_percent', 'cpu_percent']):
         try:
@@ -142,6 +230,26 @@ def check_processes(args):
     
     return data
 
+def run_checks(args):
+    """Run the selected checks once"""
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "system": platform.system(),
+        "node": platform.node(),
+    }
+
+    if args.cpu:
+        results["cpu"] = check_cpu(args)
+    if args.memory:
+        results["memory"] = check_memory(args)
+    if args.disk:
+        results["disk"] = check_disk(args)
+    if args.proc:
+        results["processes"] = check_processes(args)
+        
+    if args.json:
+        print(json.dumps(results, indent=4))
+
 def main():
     parser = argparse.ArgumentParser(description="SysCheck: Simple System Resource Monitor")
     
@@ -155,6 +263,9 @@ def main():
     parser.add_argument("--interval", type=float, default=1.0, help="CPU check interval (seconds, default: 1.0)")
     parser.add_argument("--top", type=int, default=5, help="Number of processes to list (default: 5)")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--disk-timeout", type=float, default=2.0, help="Per-mount disk probe deadline (seconds, default: 2.0)")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Repeat checks every N seconds")
+    parser.add_argument("--mount-cache", type=float, default=60.0, help="Reuse mount list for N seconds in watch mode (default: 60, 0 disables)")
     
     args = parser.parse_args()
     
@@ -162,26 +273,19 @@ def main():
         parser.print_help()
         sys.exit(1)
         
-    results = {
-        "timestamp": datetime.now().isoformat(),
-        "system": platform.system(),
-        "node": platform.node(),
-    }
-    
     if args.all:
         args.cpu = args.memory = args.disk = args.proc = True
 
-    if args.cpu:
-        results["cpu"] = check_cpu(args)
-    if args.memory:
-        results["memory"] = check_memory(args)
-    if args.disk:
-        results["disk"] = check_disk(args)
-    if args.proc:
-        results["processes"] = check_processes(args)
-        
-    if args.json:
-        print(json.dumps(results, indent=4))
+    if not args.watch:
+        run_checks(args)
+        return
+
+    try:
+        while True:
+            run_checks(args)
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print("\n[!] Watch stopped.")
 
 if __name__ == "__main__":
     main()